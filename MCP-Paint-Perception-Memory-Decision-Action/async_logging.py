@@ -0,0 +1,85 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+# Records waiting for the writer thread; beyond this new records are dropped instead of blocking
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread without ever waiting on a full queue"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DebugSampler(logging.Filter):
+    """Lets through the first and then every Nth DEBUG record of each call site; other levels always pass"""
+
+    def __init__(self, every: int = 1):
+        super().__init__()
+        self.every = max(1, every)
+        self.seen = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        site = (record.pathname, record.lineno)
+        count = self.seen.get(site, 0)
+        self.seen[site] = count + 1
+        return count % self.every == 0
+
+
+_listener = None
+_handler = None
+
+
+def setup_logging(level="INFO", path: str = None, stream=sys.stderr, debug_sample: int = 1) -> None:
+    """
+    Route all logging through a queue to one background thread that writes to path, or to
+    stream when no path is given. Callers only pay for building records that pass the level.
+    """
+    global _listener, _handler
+    stop_logging()
+    if path:
+        target = logging.FileHandler(path, encoding="utf-8")
+    else:
+        target = logging.StreamHandler(stream)
+    target.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    _handler = DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+    _handler.addFilter(DebugSampler(debug_sample))
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    _listener = logging.handlers.QueueListener(_handler.queue, target)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Write out everything still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        if _handler.dropped:
+            print(f"logging: dropped {_handler.dropped} records on a full queue", file=sys.stderr)
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,26 @@
+import os
+
+# Suffix of the partial files, for code that scans a directory written this way
+TMP_SUFFIX = ".tmp"
+
+
+def write_atomic(path: str, data: str | bytes) -> None:
+    """
+    Write data to path through a per-process temporary file and os.replace, so readers
+    (other processes included) see either the old file or the complete new one.
+    """
+    tmp_path = f"{path}.{os.getpid()}{TMP_SUFFIX}"
+    try:
+        if isinstance(data, bytes):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        else:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
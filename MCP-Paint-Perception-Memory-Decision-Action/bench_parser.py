@@ -0,0 +1,77 @@
+import argparse
+import time
+
+from mcp import types
+
+from call_parser import CallParser, parse_function_call_params, split_params
+
+# Input schemas as the server publishes them, for the tools the task uses
+TOOLS = [
+    types.Tool(name="open_paint", inputSchema={"type": "object", "properties": {}}),
+    types.Tool(name="draw_rectangle", inputSchema={
+        "type": "object",
+        "properties": {k: {"type": "integer"} for k in ("x1", "y1", "x2", "y2")},
+    }),
+    types.Tool(name="strings_to_chars_to_int", inputSchema={
+        "type": "object",
+        "properties": {"input": {"$ref": "#/$defs/StringsToIntsInput"}},
+        "$defs": {"StringsToIntsInput": {"type": "object", "properties": {"string": {"type": "string"}}}},
+    }),
+    types.Tool(name="int_list_to_exponential_sum", inputSchema={
+        "type": "object",
+        "properties": {"input": {"$ref": "#/$defs/ExpSumInput"}},
+        "$defs": {"ExpSumInput": {"type": "object", "properties": {
+            "int_list": {"type": "array", "items": {"type": "integer"}}}}},
+    }),
+    types.Tool(name="add_text_in_paint", inputSchema={
+        "type": "object", "properties": {"text": {"type": "string"}},
+    }),
+]
+
+LINES = [
+    "open_paint",
+    "draw_rectangle|x1=780|y1=380|x2=1140|y2=700",
+    "strings_to_chars_to_int|input.string=Dhanush",
+    "int_list_to_exponential_sum|input.int_list=[68, 104, 97, 110, 117, 115, 104]",
+    'add_text_in_paint|text="7.377834757903779e+50"',
+]
+
+
+def generic_parse(function_info):
+    """The original parser: split on |, literal_eval every value"""
+    parts = [p.strip() for p in function_info.split("|")]
+    return parts[0], parse_function_call_params(parts[1:]) if len(parts) > 1 else {}
+
+
+def rate(parse, lines, calls):
+    rounds = max(1, calls // len(lines))
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for line in lines:
+            parse(line)
+    return rounds * len(lines) / (time.perf_counter() - started)
+
+
+def main(calls, repeat):
+    parser = CallParser(TOOLS)
+    for line in LINES:
+        assert parser.parse(line) == generic_parse(line), line
+
+    print(f"{'line':<48} {'generic calls/s':>16} {'compiled calls/s':>17} {'speedup':>8}")
+    for line in LINES + [None]:
+        lines = LINES if line is None else [line]
+        slow = max(rate(generic_parse, lines, calls // 10) for _ in range(repeat))
+        fast = max(rate(parser.parse, lines, calls) for _ in range(repeat))
+        label = "all of the above" if line is None else (line if len(line) <= 48 else line[:45] + "...")
+        print(f"{label:<48} {slow:>16,.0f} {fast:>17,.0f} {fast / slow:>7.1f}x")
+
+    quoted = 'add_text_in_paint|text="a|b"|extra="c"'
+    print(f"\nquoted split: {split_params(quoted)}  {rate(split_params, [quoted], calls):,.0f} splits/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the generic FUNCTION_CALL parser with the schema-compiled one")
+    parser.add_argument("--calls", type=int, default=1_000_000, help="calls parsed per measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="measurements per line, best is reported")
+    args = parser.parse_args()
+    main(args.calls, args.repeat)
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from mcp import StdioServerParameters
+from session_pool import SessionPool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER = os.path.join(HERE, "example2-4.py")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def drive(pool, clients, calls):
+    """Each client borrows a session and makes calls sequential multiply calls"""
+    latencies = []
+
+    async def client(index):
+        async with pool.session() as session:
+            for i in range(calls):
+                started = time.perf_counter()
+                await session.call_tool("multiply", arguments={"a": index, "b": i})
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return time.perf_counter() - started, latencies
+
+
+async def bench(name, server, clients, calls):
+    started = time.perf_counter()
+    async with SessionPool(server, size=clients) as pool:
+        startup = time.perf_counter() - started
+        wall, latencies = await drive(pool, clients, calls)
+    total = clients * calls
+    print(f"{name:<16} {clients:>7} {total:>7} {startup:>9.2f} {wall:>7.2f} {total / wall:>9.0f} "
+          f"{1000 * percentile(latencies, 0.5):>8.2f} {1000 * percentile(latencies, 0.95):>8.2f}")
+
+
+def wait_for_port(host, port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"server did not listen on {host}:{port} within {timeout}s")
+
+
+async def main(clients, calls, port):
+    print(f"{'transport':<16} {'clients':>7} {'calls':>7} {'startup s':>9} {'wall s':>7} {'calls/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+
+    # stdio: one server process per client
+    stdio = StdioServerParameters(command=sys.executable, args=[SERVER, "--backend", "raster"], cwd=HERE)
+    await bench("stdio", stdio, clients, calls)
+
+    # streamable HTTP: one shared server process, bound to localhost only
+    server = subprocess.Popen(
+        [sys.executable, SERVER, "--backend", "raster", "--transport", "streamable-http",
+         "--host", "127.0.0.1", "--port", str(port)],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port("127.0.0.1", port)
+        await bench("streamable-http", f"http://127.0.0.1:{port}/mcp", clients, calls)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare tool-call throughput over stdio and streamable HTTP")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--calls", type=int, default=200, help="tool calls per client")
+    parser.add_argument("--port", type=int, default=8765, help="local port for the HTTP server")
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.calls, args.port))
@@ -0,0 +1,54 @@
+import argparse
+import math
+import random
+import time
+
+from vector_math import as_array, exp_sum, log_sum_exp
+
+
+def generator_exp_sum(values):
+    """The original int_list_to_exponential_sum implementation"""
+    return sum(math.exp(i) for i in values)
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(sizes, repeat, seed):
+    rng = random.Random(seed)
+    print(f"{'n':>9} {'generator ms':>13} {'numpy ms':>9} {'  from list':>11} {'lse ms':>8} {'speedup':>8} {'rel. diff':>10}")
+    for n in sizes:
+        # Values small enough for the generator not to overflow
+        values = [rng.randrange(0, 700 - int(math.log(n)) - 1) for _ in range(n)]
+        array = as_array(values)
+        slow = best_of(lambda: generator_exp_sum(values), repeat)
+        fast = best_of(lambda: exp_sum(array), repeat)
+        from_list = best_of(lambda: exp_sum(values), repeat)
+        lse = best_of(lambda: log_sum_exp(array), repeat)
+        expected, got = generator_exp_sum(values), exp_sum(values)
+        print(f"{n:>9} {1000 * slow:>13.2f} {1000 * fast:>9.2f} {1000 * from_list:>11.2f} {1000 * lse:>8.2f} "
+              f"{slow / from_list:>7.1f}x {abs(got - expected) / expected:>10.1e}")
+
+    # Inputs the generator cannot handle at all
+    big = [1000.0] * 10
+    try:
+        generator_exp_sum(big)
+    except OverflowError as e:
+        print(f"\ngenerator on [1000]*10: OverflowError ({e})")
+    print(f"log_sum_exp on [1000]*10: {log_sum_exp(big):.6f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the generator exp-sum with the NumPy vector implementation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000, 1_000_000],
+                        help="list lengths to time")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, best is reported")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random inputs")
+    args = parser.parse_args()
+    main(args.sizes, args.repeat, args.seed)
@@ -0,0 +1,103 @@
+import math
+import os
+
+# Largest number of Fibonacci values returned by one call; longer sequences are fetched in chunks
+FIBONACCI_CHUNK = int(os.getenv("FIBONACCI_CHUNK", "1000"))
+# Digits of the largest single integer in a result. MCP clients parse replies with pydantic,
+# whose JSON parser rejects integers longer than 4300 digits (and the request never completes)
+MAX_VALUE_DIGITS = int(os.getenv("TOOL_MAX_VALUE_DIGITS", "4300"))
+# Budget on the estimated decimal digits of one whole result
+MAX_RESULT_DIGITS = int(os.getenv("TOOL_MAX_RESULT_DIGITS", "1000000"))
+
+LOG10_PHI = math.log10((1 + math.sqrt(5)) / 2)
+LOG10_SQRT5 = math.log10(math.sqrt(5))
+
+
+def factorial_digits(n: int) -> int:
+    """Decimal digits of n!, from log-gamma"""
+    return int(math.lgamma(n + 1) / math.log(10)) + 1 if n > 1 else 1
+
+
+def fibonacci_digits(k: int) -> int:
+    """Decimal digits of F(k), from Binet's formula"""
+    return max(1, int(k * LOG10_PHI - LOG10_SQRT5) + 1)
+
+
+def largest_input(digits, limit: int) -> int:
+    """Largest k whose result has at most limit digits, for a digits(k) that grows with k"""
+    low, high = 0, 1
+    while digits(high) <= limit:
+        low, high = high, high * 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        low, high = (middle, high) if digits(middle) <= limit else (low, middle)
+    return low
+
+
+# Largest Fibonacci index whose value fits in MAX_VALUE_DIGITS
+FIBONACCI_MAX_INDEX = largest_input(fibonacci_digits, MAX_VALUE_DIGITS)
+# Hard ceilings on tool inputs, checked before anything is computed. By default they are the
+# largest inputs whose results fit in MAX_VALUE_DIGITS (1558! and F(0) .. F(20577) at 4300 digits)
+FACTORIAL_MAX_N = int(os.getenv("FACTORIAL_MAX_N", largest_input(factorial_digits, MAX_VALUE_DIGITS)))
+FIBONACCI_MAX_N = int(os.getenv("FIBONACCI_MAX_N", FIBONACCI_MAX_INDEX + 1))
+
+
+class CostExceeded(ValueError):
+    """A call would exceed an input ceiling or a digit limit"""
+
+
+def check_value_digits(what: str, digits: int) -> None:
+    if digits > MAX_VALUE_DIGITS:
+        raise CostExceeded(f"{what} would have about {digits} digits, over the limit of {MAX_VALUE_DIGITS}")
+
+
+def fibonacci_pair(k: int) -> tuple[int, int]:
+    """(F(k), F(k+1)) by fast doubling, O(log k) big-integer multiplications"""
+    a, b = 0, 1
+    for bit in bin(k)[2:]:
+        # F(2m) = F(m) * (2F(m+1) - F(m)), F(2m+1) = F(m)^2 + F(m+1)^2
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        a, b = (d, c + d) if bit == "1" else (c, d)
+    return a, b
+
+
+def factorial(n: int) -> int:
+    """n! after checking the ceiling and the digit limit"""
+    if n < 0:
+        raise ValueError("factorial() not defined for negative values")
+    if n > FACTORIAL_MAX_N:
+        raise CostExceeded(f"factorial input {n} is above the ceiling of {FACTORIAL_MAX_N}")
+    check_value_digits(f"factorial({n})", factorial_digits(n))
+    return math.factorial(n)
+
+
+def fibonacci_range(n: int, offset: int = 0, chunk: int = None) -> list[int]:
+    """
+    The Fibonacci numbers F(offset) .. F(n-1), at most chunk of them, at most
+    MAX_RESULT_DIGITS digits in total and none past FIBONACCI_MAX_INDEX. Fewer than
+    n - offset values means more remain: fetch them from offset + len(values). The start
+    of the chunk is reached by fast doubling, so a later chunk costs no more than computing
+    its own values.
+    """
+    chunk = FIBONACCI_CHUNK if chunk is None else chunk
+    if n <= 0 or offset >= n:
+        return []
+    if offset < 0:
+        raise ValueError("offset must not be negative")
+    if n > FIBONACCI_MAX_N:
+        raise CostExceeded(f"fibonacci length {n} is above the ceiling of {FIBONACCI_MAX_N}")
+    check_value_digits(f"F({offset})", fibonacci_digits(offset))
+    # Stop at the last value within the digit limit rather than rejecting the whole chunk
+    count = min(chunk, n - offset, FIBONACCI_MAX_INDEX - offset + 1)
+    # Digit counts grow linearly with the index, so the chunk total is an arithmetic series;
+    # a chunk over the result budget is shortened and the caller continues from the next offset
+    while count > 1 and count * (fibonacci_digits(offset) + fibonacci_digits(offset + count - 1)) // 2 > MAX_RESULT_DIGITS:
+        count //= 2
+
+    a, b = fibonacci_pair(offset)
+    values = []
+    for _ in range(count):
+        values.append(a)
+        a, b = b, a + b
+    return values
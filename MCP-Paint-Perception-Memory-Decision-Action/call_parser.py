@@ -0,0 +1,208 @@
+import ast
+
+QUOTES = "\"'"
+
+
+def literal_value(value: str):
+    """Python literal (int, float, list, quoted string, ...) if value is one, otherwise the raw text"""
+    try:
+        return ast.literal_eval(value)
+    except Exception:
+        return value.strip()
+
+
+def parse_function_call_params(param_parts: list[str]) -> dict:
+    """
+    Parses key=value parts from the FUNCTION_CALL format.
+    Supports nested keys like input.string=foo and list values like input.int_list=[1,2,3]
+    Returns a nested dictionary.
+    """
+    result = {}
+
+    for part in param_parts:
+        if "=" not in part:
+            raise ValueError(f"Invalid parameter format (expected key=value): {part}")
+
+        key, value = part.split("=", 1)
+
+        # Try to parse as Python literal (int, float, list, etc.)
+        parsed_value = literal_value(value)
+
+        # Support nested keys like input.string
+        keys = key.split(".")
+        current = result
+        for k in keys[:-1]:
+            current = current.setdefault(k, {})
+        current[keys[-1]] = parsed_value
+
+    return result
+
+
+def _value_is_open(part: str) -> bool:
+    # A value starting with a quote or [ continues past a | until its quotes and brackets close
+    value = part.partition("=")[2].lstrip()
+    if not value or (value[0] not in QUOTES and value[0] != "["):
+        return False
+    quote = None
+    depth = 0
+    escaped = False
+    for ch in value:
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch in QUOTES:
+            quote = ch
+        elif ch == "[":
+            depth += 1
+        elif ch == "]":
+            depth -= 1
+    return quote is not None or depth > 0
+
+
+def split_params(function_info: str) -> list[str]:
+    """
+    Split 'tool|k=v|k=v' on | and strip the parts. A | inside a quoted value or a list
+    (text="a|b", commands=["x|y"]) does not split; text without quotes takes the plain str.split path.
+    """
+    segments = function_info.split("|")
+    if '"' not in function_info and "'" not in function_info:
+        return [s.strip() for s in segments]
+    parts = []
+    pending = None
+    for segment in segments:
+        part = segment if pending is None else f"{pending}|{segment}"
+        if _value_is_open(part):
+            pending = part
+            continue
+        parts.append(part.strip())
+        pending = None
+    if pending is not None:
+        # Unterminated quote: keep what there is and let coercion decide
+        parts.append(pending.strip())
+    return parts
+
+
+# Coercers turn the text of one value into the type its schema asks for. Each tries the
+# cheap conversion first and falls back to literal_value, so $id references and anything
+# unexpected come through exactly as with the generic parser.
+
+def _to_int(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        return literal_value(value)
+
+
+def _to_float(value: str):
+    try:
+        return float(value)
+    except ValueError:
+        return literal_value(value)
+
+
+def _to_str(value: str):
+    value = value.strip()
+    if len(value) >= 2 and value[0] in QUOTES and value[-1] == value[0]:
+        if "\\" not in value:
+            return value[1:-1]
+        return literal_value(value)
+    return value
+
+
+_BOOLS = {"true": True, "false": False}
+
+
+def _to_bool(value: str):
+    flag = _BOOLS.get(value.strip().lower())
+    return flag if flag is not None else literal_value(value)
+
+
+def _number_list(convert):
+    def coerce(value: str):
+        text = value.strip()
+        if text[:1] == "[" and text[-1:] == "]":
+            inner = text[1:-1]
+            if not inner.strip():
+                return []
+            try:
+                return [convert(item) for item in inner.split(",")]
+            except ValueError:
+                pass
+        return literal_value(value)
+
+    return coerce
+
+
+_SCALARS = {"integer": _to_int, "number": _to_float, "string": _to_str, "boolean": _to_bool}
+_LISTS = {"integer": _number_list(int), "number": _number_list(float)}
+
+
+def _resolve(schema: dict, root: dict) -> dict:
+    while "$ref" in schema:
+        schema = root.get("$defs", {}).get(schema["$ref"].rsplit("/", 1)[-1], {})
+    options = [s for s in schema.get("anyOf", ()) if s.get("type") != "null"]
+    if len(options) == 1:
+        # Optional[X] is anyOf [X, null]
+        return _resolve(options[0], root)
+    return schema
+
+
+def _coercer(schema: dict, root: dict):
+    kind = schema.get("type")
+    if kind == "array":
+        items = _resolve(schema.get("items", {}), root)
+        return _LISTS.get(items.get("type"), literal_value)
+    return _SCALARS.get(kind, literal_value)
+
+
+def compile_coercers(input_schema: dict, root: dict = None, prefix: str = "") -> dict:
+    """
+    Map every parameter key the FUNCTION_CALL format can name to its coercer, flattening
+    nested objects (Pydantic model arguments) into dotted keys such as input.int_list.
+    """
+    root = root or input_schema
+    coercers = {}
+    for name, prop in (input_schema.get("properties") or {}).items():
+        prop = _resolve(prop, root)
+        if prop.get("type") == "object" and "properties" in prop:
+            coercers.update(compile_coercers(prop, root, f"{prefix}{name}."))
+        else:
+            coercers[prefix + name] = _coercer(prop, root)
+    return coercers
+
+
+class CallParser:
+    """Turns FUNCTION_CALL parameters into arguments typed by each tool's inputSchema, compiled once per session"""
+
+    def __init__(self, tools):
+        self.coercers = {tool.name: compile_coercers(tool.inputSchema or {}) for tool in tools}
+
+    def parse_params(self, name: str, param_parts: list[str]) -> dict:
+        coercers = self.coercers.get(name)
+        if coercers is None:
+            return parse_function_call_params(param_parts)
+        result = {}
+        for part in param_parts:
+            key, sep, value = part.partition("=")
+            if not sep:
+                raise ValueError(f"Invalid parameter format (expected key=value): {part}")
+            key = key.strip()
+            parsed_value = coercers.get(key, literal_value)(value)
+            if "." in key:
+                keys = key.split(".")
+                current = result
+                for k in keys[:-1]:
+                    current = current.setdefault(k, {})
+                current[keys[-1]] = parsed_value
+            else:
+                result[key] = parsed_value
+        return result
+
+    def parse(self, function_info: str) -> tuple[str, dict]:
+        """(tool name, arguments) of the text after 'FUNCTION_CALL:'"""
+        parts = split_params(function_info)
+        return parts[0], (self.parse_params(parts[0], parts[1:]) if len(parts) > 1 else {})
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from mcp import StdioServerParameters
+
+from async_logging import setup_logging
+from call_parser import CallParser
+from episode_log import EpisodeRecorder
+from llm import PROVIDERS, make_provider
+from session_pool import SessionPool
+from talk2mcp2 import QUERY, Episode, build_system_prompt, load_tools, percentile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER = os.path.join(HERE, "example2-4.py")
+REPLY_PREFIXES = ("FUNCTION_CALL:", "FINAL_ANSWER:", "ERROR_HALT:")
+
+
+def turn_is_malformed(event: dict) -> bool:
+    """An LLM turn with neither structured calls nor a line the text protocol understands"""
+    if event.get("function_calls"):
+        return False
+    lines = [line.strip() for line in event["response"].split("\n")]
+    return not any(line.startswith(REPLY_PREFIXES) for line in lines)
+
+
+def summarize(mode: str, runs: list, wall: float) -> str:
+    events = [e for run in runs for e in run.recorder.events]
+    llm_turns = [e for e in events if e["type"] == "llm"]
+    tool_calls = [e for e in events if e["type"] == "tool"]
+    completed = sum(1 for run in runs if run.completed)
+    durations = [run.elapsed for run in runs]
+    llm_latency = sum(e["elapsed"] for e in llm_turns) / len(llm_turns) if llm_turns else 0.0
+    return (f"{mode:<8} {len(runs):>8} {completed / len(runs):>8.0%} {sum(durations) / len(durations):>8.2f} "
+            f"{percentile(durations, 0.5):>7.2f} {percentile(durations, 0.95):>7.2f} "
+            f"{len(llm_turns) / len(runs):>9.1f} {1000 * llm_latency:>9.0f} "
+            f"{sum(1 for e in llm_turns if turn_is_malformed(e)):>10} "
+            f"{sum(1 for e in tool_calls if 'error' in e):>11} {wall:>7.2f}")
+
+
+async def run_mode(mode, pool, tools, llm_name, transcript, episodes):
+    system_prompt = build_system_prompt("none", native_tools=mode == "native")
+    call_parser = CallParser(tools)
+    runs = []
+    for i in range(episodes):
+        model = make_provider(llm_name, system_prompt, transcript)
+        if mode == "native":
+            model.use_tools(tools)
+        runs.append(Episode(model, system_prompt, query=QUERY, recorder=EpisodeRecorder(), episode_id=i,
+                            verbose=False, call_parser=call_parser))
+
+    async def run_one(episode):
+        async with pool.session() as session:
+            return await episode.run(session, tools)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_one(episode) for episode in runs))
+    return runs, time.perf_counter() - started
+
+
+async def main(llm_name, transcript, modes, episodes, sessions):
+    level = logging.getLevelName(logging.getLogger().getEffectiveLevel())
+    server = StdioServerParameters(command=sys.executable, args=[SERVER, "--backend", "raster", "--log-level", level],
+                                   cwd=HERE)
+    async with SessionPool(server, size=sessions) as pool:
+        async with pool.session() as session:
+            tools, _ = await load_tools(session)
+        print(f"{'mode':<8} {'episodes':>8} {'success':>8} {'mean s':>8} {'p50 s':>7} {'p95 s':>7} "
+              f"{'LLM turns':>9} {'LLM ms':>9} {'malformed':>10} {'tool errors':>11} {'wall s':>7}")
+        for mode in modes:
+            runs, wall = await run_mode(mode, pool, tools, llm_name, transcript, episodes)
+            print(summarize(mode, runs, wall))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the Paint task in text (FUNCTION_CALL lines) and native function-calling mode "
+                    "and compare success rate, latency and malformed turns")
+    parser.add_argument("--llm", choices=PROVIDERS, help="LLM provider (default: $LLM_PROVIDER or gemini)")
+    parser.add_argument("--transcript", help="JSONL transcript for the scripted provider")
+    parser.add_argument("--modes", nargs="+", choices=["text", "native"], default=["text", "native"],
+                        help="tool-calling modes to compare")
+    parser.add_argument("--episodes", type=int, default=10, help="episodes per mode")
+    parser.add_argument("--sessions", type=int, default=2, help="tool server sessions shared by the episodes")
+    parser.add_argument("--log-level", default="WARNING", type=str.upper,
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="least severe messages to log")
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    asyncio.run(main(args.llm, args.transcript, args.modes, args.episodes, args.sessions))
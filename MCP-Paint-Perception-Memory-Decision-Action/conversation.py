@@ -0,0 +1,57 @@
+class Conversation:
+    """
+    Multi-turn prompt with a fixed system prefix.
+    The system prompt is set once (as the model's system instruction) and never rewritten,
+    so provider-side prefix caching can hit; each iteration only appends new turns.
+    With max_turns set, the first exchange (the task and the reply to it) is pinned and
+    only the latest max_turns turns after it are kept, dropped in whole user/model pairs
+    so every kept reply still follows the turn it answers. on_drop(role, text) is called
+    for every turn that leaves the window.
+    """
+
+    PINNED = 2
+
+    def __init__(self, system_prompt: str, max_turns: int = None, on_drop=None):
+        self.system_prompt = system_prompt
+        self.prefix_bytes = len(system_prompt.encode("utf-8"))
+        self.max_turns = max_turns
+        self.on_drop = on_drop
+        self.turns = []
+        self._appended_bytes = 0
+
+    def _append(self, role: str, text: str) -> None:
+        self.turns.append((role, text))
+        self._appended_bytes += len(text.encode("utf-8"))
+        excess = len(self.turns) - self.PINNED - (self.max_turns or 0)
+        if self.max_turns is not None and excess > 0:
+            # Drop the oldest exchanges after the pinned one, a user turn and its reply at a time
+            excess += excess % 2
+            dropped = self.turns[self.PINNED:self.PINNED + excess]
+            self.turns = self.turns[:self.PINNED] + self.turns[self.PINNED + excess:]
+            if self.on_drop:
+                for role, text in dropped:
+                    self.on_drop(role, text)
+
+    def add_user(self, text: str) -> None:
+        self._append("user", text)
+
+    def add_model(self, text: str) -> None:
+        self._append("model", text)
+
+    def contents(self) -> list[dict]:
+        """Turns in the Gemini generate_content format"""
+        return [{"role": role, "parts": [text]} for role, text in self.turns]
+
+    def next_request(self):
+        """
+        Return (contents, stats) for the next model call.
+        stats has the byte size of the static prefix, of the turn history being sent,
+        and of the delta appended since the previous request.
+        """
+        stats = {
+            "prefix_bytes": self.prefix_bytes,
+            "history_bytes": sum(len(text.encode("utf-8")) for _, text in self.turns),
+            "delta_bytes": self._appended_bytes,
+        }
+        self._appended_bytes = 0
+        return self.contents(), stats
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import re
+import time
+
+from call_parser import split_params
+
+# A whole argument value of the form $id or $id.field.subfield refers to another call's result
+REF = re.compile(r"^\$(\w+)((?:\.\w+)*)$")
+
+
+class ToolCall:
+    """
+    One FUNCTION_CALL line of a multi-call turn. after lists calls that must finish
+    first without passing a value, e.g. opening Paint before drawing in it.
+    """
+
+    def __init__(self, call_id: str, name: str, arguments: dict, after=()):
+        self.id = call_id
+        self.name = name
+        self.arguments = arguments
+        self.after = set(after)
+        self.deps = find_refs(arguments) | self.after
+
+    def __repr__(self):
+        return f"ToolCall({self.id}={self.name}, {self.arguments})"
+
+
+def parse_function_calls(response_text: str, parse_params) -> list[ToolCall]:
+    """
+    Parse every FUNCTION_CALL line of a response. A line may name its call:
+      FUNCTION_CALL: ascii=strings_to_chars_to_int|input.string=Dhanush
+    Unnamed calls get their 1-based position as id ($1, $2, ...).
+    parse_params(name, parts) turns the key=value parts of a call to tool name into an argument dict.
+    """
+    calls = []
+    for line in response_text.split("\n"):
+        line = line.strip()
+        if not line.startswith("FUNCTION_CALL:"):
+            continue
+        _, function_info = line.split(":", 1)
+        parts = split_params(function_info)
+        head, param_parts = parts[0], parts[1:]
+        if "=" in head:
+            call_id, name = (s.strip() for s in head.split("=", 1))
+        else:
+            call_id, name = str(len(calls) + 1), head
+        arguments = parse_params(name, param_parts) if param_parts else {}
+        calls.append(ToolCall(call_id, name, arguments))
+
+    ids = [call.id for call in calls]
+    duplicates = {i for i in ids if ids.count(i) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate call ids: {', '.join(sorted(duplicates))}")
+    return calls
+
+
+def find_refs(value) -> set[str]:
+    if isinstance(value, str):
+        match = REF.match(value)
+        return {match.group(1)} if match else set()
+    if isinstance(value, dict):
+        return set().union(*(find_refs(v) for v in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(find_refs(v) for v in value)) if value else set()
+    return set()
+
+
+def result_value(result):
+    """Structured value of a tool result, used when another call references it"""
+    value = getattr(result, "structuredContent", None)
+    if value is None:
+        texts = [item.text for item in getattr(result, "content", []) if hasattr(item, "text")]
+        text = texts[0] if len(texts) == 1 else "\n".join(texts)
+        try:
+            value = json.loads(text)
+        except ValueError:
+            value = text
+    return value
+
+
+def resolve_refs(value, values: dict):
+    """Replace $id / $id.path references with the referenced call's result"""
+    if isinstance(value, str):
+        match = REF.match(value)
+        if not match:
+            return value
+        resolved = values[match.group(1)]
+        path = [p for p in match.group(2).split(".") if p]
+        if not path and isinstance(resolved, dict) and list(resolved) == ["result"]:
+            # Bare $id on a {"result": x} output means x
+            return resolved["result"]
+        for key in path:
+            resolved = resolved[int(key)] if isinstance(resolved, list) else resolved[key]
+        return resolved
+    if isinstance(value, dict):
+        return {k: resolve_refs(v, values) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_refs(v, values) for v in value]
+    return value
+
+
+def check_graph(calls: list[ToolCall]) -> None:
+    """Reject references to unknown calls and dependency cycles"""
+    by_id = {call.id: call for call in calls}
+    for call in calls:
+        unknown = call.deps - by_id.keys()
+        if unknown:
+            raise ValueError(f"{call.id}={call.name} references unknown call(s): {', '.join(sorted(unknown))}")
+
+    visiting, done = set(), set()
+
+    def visit(call_id):
+        if call_id in done:
+            return
+        if call_id in visiting:
+            raise ValueError(f"Dependency cycle through call {call_id}")
+        visiting.add(call_id)
+        for dep in by_id[call_id].deps:
+            visit(dep)
+        visiting.discard(call_id)
+        done.add(call_id)
+
+    for call in calls:
+        visit(call.id)
+
+
+async def dispatch_calls(calls: list[ToolCall], call_tool) -> dict:
+    """
+    Execute the calls, running each as soon as the calls it references have finished,
+    so independent calls run concurrently. call_tool(name, arguments) is awaited per call.
+    Returns {id: (arguments, result, exception, elapsed)} where arguments have references
+    resolved and elapsed is the time spent in call_tool.
+    """
+    check_graph(calls)
+    values = {}
+    outcomes = {}
+    tasks = {}
+
+    async def run(call):
+        # Every failure becomes the call's outcome; none may escape gather and abort the other calls
+        try:
+            await run_call(call)
+        except Exception as e:
+            outcomes.setdefault(call.id, (call.arguments, None, e, 0.0))
+
+    async def run_call(call):
+        for dep in call.deps:
+            await tasks[dep]
+        failed = [dep for dep in call.deps if outcomes[dep][2] is not None]
+        if failed:
+            outcomes[call.id] = (call.arguments, None, RuntimeError(f"dependency {', '.join(sorted(failed))} failed"), 0.0)
+            return
+        try:
+            arguments = resolve_refs(call.arguments, values)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            outcomes[call.id] = (call.arguments, None, ValueError(f"cannot resolve reference in {call.id}: {e}"), 0.0)
+            return
+        started = time.perf_counter()
+        try:
+            result = await call_tool(call.name, arguments)
+        except Exception as e:
+            outcomes[call.id] = (arguments, None, e, time.perf_counter() - started)
+            return
+        elapsed = time.perf_counter() - started
+        if getattr(result, "isError", False):
+            outcomes[call.id] = (arguments, result, RuntimeError(f"{call.name} returned an error"), elapsed)
+            return
+        values[call.id] = result_value(result)
+        outcomes[call.id] = (arguments, result, None, elapsed)
+
+    for call in calls:
+        tasks[call.id] = asyncio.ensure_future(run(call))
+    await asyncio.gather(*tasks.values())
+    return outcomes
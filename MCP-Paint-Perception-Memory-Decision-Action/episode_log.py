@@ -0,0 +1,72 @@
+import json
+import time
+
+
+class EpisodeRecorder:
+    """
+    Append-only JSONL log of one agent episode.
+    Every event is one line with a "type" of episode, plan, llm or tool. llm events carry
+    the user turn sent and the "response" received, so the log doubles as a
+    transcript for llm.ScriptedProvider. With path=None events are only kept in memory.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.events = []
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def _write(self, event: dict) -> None:
+        event["ts"] = round(time.time(), 6)
+        self.events.append(event)
+        if self._file:
+            self._file.write(json.dumps(event, separators=(",", ":"), default=str) + "\n")
+            self._file.flush()
+
+    def episode(self, **fields) -> None:
+        self._write({"type": "episode", **fields})
+
+    def plan(self, source: str, calls: list[dict]) -> None:
+        self._write({"type": "plan", "source": source, "calls": calls})
+
+    def llm(self, iteration: int, prompt: str, response: str, elapsed: float, **fields) -> None:
+        self._write({"type": "llm", "iteration": iteration, "prompt": prompt,
+                     "response": response, "elapsed": round(elapsed, 6), **fields})
+
+    def tool(self, iteration: int, name: str, arguments: dict, result: str = None,
+             elapsed: float = 0.0, error: str = None) -> None:
+        event = {"type": "tool", "iteration": iteration, "name": name, "arguments": arguments,
+                 "elapsed": round(elapsed, 6)}
+        if error is None:
+            event["result"] = result
+        else:
+            event["error"] = error
+        self._write(event)
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def load_events(path: str) -> list[dict]:
+    """Read every event of a recorded episode"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_tool_timings(recorded: list[dict], replayed: list[dict]) -> str:
+    """Side-by-side tool latencies of a recorded episode and its replay, matched by call order"""
+    before = [e for e in recorded if e.get("type") == "tool"]
+    after = [e for e in replayed if e.get("type") == "tool"]
+    lines = [f"{'#':>3} {'tool':<30} {'recorded ms':>12} {'replay ms':>12} {'change':>8}"]
+    for i, (old, new) in enumerate(zip(before, after), start=1):
+        name = old["name"] if old["name"] == new["name"] else f"{old['name']}/{new['name']}"
+        old_ms, new_ms = old["elapsed"] * 1000, new["elapsed"] * 1000
+        change = f"{(new_ms - old_ms) / old_ms:+.0%}" if old_ms else "n/a"
+        lines.append(f"{i:>3} {name:<30} {old_ms:>12.2f} {new_ms:>12.2f} {change:>8}")
+    if len(before) != len(after):
+        lines.append(f"Call count differs: recorded {len(before)}, replay {len(after)}")
+    total_old = sum(e["elapsed"] for e in before) * 1000
+    total_new = sum(e["elapsed"] for e in after) * 1000
+    lines.append(f"{'':>3} {'total':<30} {total_old:>12.2f} {total_new:>12.2f}")
+    return "\n".join(lines)
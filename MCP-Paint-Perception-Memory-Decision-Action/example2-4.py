@@ -1,64 +1,102 @@
 # basic import 
-from mcp.server.fastmcp import FastMCP, Image
+# Heavy, tool-specific libraries (PIL, pywinauto, win32*, numpy) are imported
+# inside the tools that need them, so math-only sessions never load them
+import time
+_startup = [("start", time.perf_counter())]
+from mcp.server.fastmcp import Context, FastMCP, Image
 from mcp.server.fastmcp.prompts import base
 from mcp.types import TextContent
 from mcp import types
-from PIL import Image as PILImage
+import argparse
+import asyncio
+import atexit
+import bigmath
+import concurrent.futures
+import json
+import logging
 import math
+import os
 import sys
-from pywinauto.application import Application
-import win32gui
-import win32con
-import time
-import win32api
-from win32api import GetSystemMetrics
+from async_logging import setup_logging
+from paint_backend import BACKENDS, make_backend, parse_draw_command
+from tool_memo import RESULT_CACHE, pure
+from tool_metrics import instrument_tools, start_prometheus_dump
+from tracing import configure as configure_tracing, instrument_tracing
 from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput
+_startup.append(("imports", time.perf_counter()))
 
 
+# On stdio transport stdout carries the protocol, so all server output goes through logging (stderr or --log-file)
+logger = logging.getLogger("server")
+
 # instantiate an MCP server client
 mcp = FastMCP("Calculator")
+# Call counts, errors and latency histograms for every tool, served as metrics:// resources
+TOOL_METRICS = instrument_tools(mcp)
+# Tool spans joined to the client's trace; recorded only when --trace-file is given
+instrument_tracing(mcp)
+
+# Drawing surface used by the Paint tools, replaced by --backend at startup
+paint = make_backend()
+# Backend calls block (GUI waits, canvas fills), so they run here, one at a time in order,
+# while the event loop keeps serving other sessions
+PAINT_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="paint")
+
+
+async def on_paint_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(PAINT_EXECUTOR, fn, *args)
+
+
+def save_canvas(path: str) -> None:
+    if not paint.is_open():
+        logger.warning("Canvas not saved to %s: Paint was never opened", path)
+        return
+    paint.save(path)
+    logger.info("Canvas saved to %s", path)
 
 # DEFINE TOOLS
+# Tools marked @pure depend only on their arguments; repeated calls are served from RESULT_CACHE
 
 #addition tool
 @mcp.tool()
 def add(input: AddInput) -> AddOutput:
     """Add two numbers"""
-    print("CALLED: add(AddInput) -> AddOutput")
+    logger.debug("CALLED: add(AddInput) -> AddOutput")
     return AddOutput(result=input.a + input.b)
 
 @mcp.tool()
 def sqrt(input: SqrtInput) -> SqrtOutput:
     """Square root of a number"""
-    print("CALLED: sqrt(SqrtInput) -> SqrtOutput")
+    logger.debug("CALLED: sqrt(SqrtInput) -> SqrtOutput")
     return SqrtOutput(result=input.a ** 0.5)
 
 # subtraction tool
 @mcp.tool()
 def subtract(a: int, b: int) -> int:
     """Subtract two numbers"""
-    print("CALLED: subtract(a: int, b: int) -> int:")
+    logger.debug("CALLED: subtract(a: int, b: int) -> int:")
     return int(a - b)
 
 # multiplication tool
 @mcp.tool()
 def multiply(a: int, b: int) -> int:
     """Multiply two numbers"""
-    print("CALLED: multiply(a: int, b: int) -> int:")
+    logger.debug("CALLED: multiply(a: int, b: int) -> int:")
     return int(a * b)
 
 #  division tool
 @mcp.tool() 
 def divide(a: int, b: int) -> float:
     """Divide two numbers"""
-    print("CALLED: divide(a: int, b: int) -> float:")
+    logger.debug("CALLED: divide(a: int, b: int) -> float:")
     return float(a / b)
 
 # power tool
 @mcp.tool()
+@pure
 def power(a: int, b: int) -> int:
     """Power of two numbers"""
-    print("CALLED: power(a: int, b: int) -> int:")
+    logger.debug("CALLED: power(a: int, b: int) -> int:")
     return int(a ** b)
 
 
@@ -66,98 +104,180 @@ def power(a: int, b: int) -> int:
 @mcp.tool()
 def cbrt(a: int) -> float:
     """Cube root of a number"""
-    print("CALLED: cbrt(a: int) -> float:")
+    logger.debug("CALLED: cbrt(a: int) -> float:")
     return float(a ** (1/3))
 
 # factorial tool
 @mcp.tool()
+@pure
 def factorial(a: int) -> int:
     """factorial of a number"""
-    print("CALLED: factorial(a: int) -> int:")
-    return int(math.factorial(a))
+    logger.debug("CALLED: factorial(a: int) -> int:")
+    # Rejects inputs above the ceiling or results over the digit budget before computing
+    return bigmath.factorial(a)
 
 # log tool
 @mcp.tool()
 def log(a: int) -> float:
     """log of a number"""
-    print("CALLED: log(a: int) -> float:")
+    logger.debug("CALLED: log(a: int) -> float:")
     return float(math.log(a))
 
 # remainder tool
 @mcp.tool()
 def remainder(a: int, b: int) -> int:
     """remainder of two numbers divison"""
-    print("CALLED: remainder(a: int, b: int) -> int:")
+    logger.debug("CALLED: remainder(a: int, b: int) -> int:")
     return int(a % b)
 
 # sin tool
 @mcp.tool()
 def sin(a: int) -> float:
     """sin of a number"""
-    print("CALLED: sin(a: int) -> float:")
+    logger.debug("CALLED: sin(a: int) -> float:")
     return float(math.sin(a))
 
 # cos tool
 @mcp.tool()
 def cos(a: int) -> float:
     """cos of a number"""
-    print("CALLED: cos(a: int) -> float:")
+    logger.debug("CALLED: cos(a: int) -> float:")
     return float(math.cos(a))
 
 # tan tool
 @mcp.tool()
 def tan(a: int) -> float:
     """tan of a number"""
-    print("CALLED: tan(a: int) -> float:")
+    logger.debug("CALLED: tan(a: int) -> float:")
     return float(math.tan(a))
 
 # mine tool
 @mcp.tool()
 def mine(a: int, b: int) -> int:
     """special mining tool"""
-    print("CALLED: mine(a: int, b: int) -> int:")
+    logger.debug("CALLED: mine(a: int, b: int) -> int:")
     return int(a - b - b)
 
 @mcp.tool()
-def create_thumbnail(image_path: str) -> Image:
-    """Create a thumbnail from an image"""
-    print("CALLED: create_thumbnail(image_path: str) -> Image:")
-    img = PILImage.open(image_path)
-    img.thumbnail((100, 100))
-    return Image(data=img.tobytes(), format="png")
+def create_thumbnail(image_path: str, format: str = "png") -> Image:
+    """Create a thumbnail from an image, encoded as png or webp"""
+    logger.debug("CALLED: create_thumbnail(image_path: str, format: str = \"png\") -> Image:")
+    from thumbnails import make_thumbnail
+
+    data, _ = make_thumbnail(image_path, fmt=format)
+    return Image(data=data, format=format.lower())
+
+@mcp.tool()
+async def batch_thumbnails(output_dir: str, paths: list[str] = None, pattern: str = None,
+                           size: int = 100, format: str = "png", ctx: Context = None) -> dict:
+    """Thumbnail many images into output_dir, using all cores. Give a list of paths and/or a glob
+    pattern such as photos/**/*.jpg. Reports per-file progress and returns a manifest, also written
+    to output_dir/manifest.json"""
+    logger.debug("CALLED: batch_thumbnails(output_dir: str, paths: list[str], pattern: str, ...) -> dict:")
+    from thumbnails import FORMATS, batch_inputs, batch_worker, get_pool, output_names
+
+    format = format.lower()
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported thumbnail format {format!r}, choose from {', '.join(FORMATS)}")
+    files = batch_inputs(paths, pattern)
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = [os.path.join(output_dir, name) for name in output_names(files, format)]
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    futures = [
+        loop.run_in_executor(pool, batch_worker, path, out, (size, size), format)
+        for path, out in zip(files, outputs)
+    ]
+    entries = []
+    for done in asyncio.as_completed(futures):
+        entry = await done
+        entries.append(entry)
+        if ctx is not None:
+            status = "ok" if entry["ok"] else "failed"
+            await ctx.report_progress(len(entries), len(files), f"{os.path.basename(entry['path'])}: {status}")
+
+    position = {path: i for i, path in enumerate(files)}
+    entries.sort(key=lambda e: position[e["path"]])
+    manifest = {
+        "output_dir": os.path.abspath(output_dir),
+        "format": format,
+        "size": size,
+        "total": len(files),
+        "succeeded": sum(1 for e in entries if e["ok"]),
+        "failed": sum(1 for e in entries if not e["ok"]),
+        "cache_hits": sum(1 for e in entries if e.get("cache_hit")),
+        "elapsed": round(time.perf_counter() - started, 3),
+        "files": entries,
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
 
 @mcp.tool()
+@pure
 def strings_to_chars_to_int(input: StringsToIntsInput) -> StringsToIntsOutput:
     """Return the ASCII values of the characters in a word"""
-    print("CALLED: strings_to_chars_to_int(StringsToIntsInput) -> StringsToIntsOutput")
+    logger.debug("CALLED: strings_to_chars_to_int(StringsToIntsInput) -> StringsToIntsOutput")
     ascii_values = [ord(char) for char in input.string]
     return StringsToIntsOutput(ascii_values=ascii_values)
 
 @mcp.tool()
+@pure
 def int_list_to_exponential_sum(input: ExpSumInput) -> ExpSumOutput:
     """Return sum of exponentials of numbers in a list"""
-    print("CALLED: int_list_to_exponential_sum(ExpSumInput) -> ExpSumOutput")
-    result = sum(math.exp(i) for i in input.int_list)
-    return ExpSumOutput(result=result)
+    logger.debug("CALLED: int_list_to_exponential_sum(ExpSumInput) -> ExpSumOutput")
+    from vector_math import exp_sum
+
+    return ExpSumOutput(result=exp_sum(input.int_list))
+
+@mcp.tool()
+@pure
+def log_sum_exp(values: list[float]) -> float:
+    """Return log of the sum of exponentials of numbers in a list, safe for large values"""
+    logger.debug("CALLED: log_sum_exp(values: list[float]) -> float:")
+    from vector_math import log_sum_exp as lse
+
+    return lse(values)
 
 @mcp.tool()
-def fibonacci_numbers(n: int) -> list:
-    """Return the first n Fibonacci Numbers"""
-    print("CALLED: fibonacci_numbers(n: int) -> list:")
-    if n <= 0:
-        return []
-    fib_sequence = [0, 1]
-    for _ in range(2, n):
-        fib_sequence.append(fib_sequence[-1] + fib_sequence[-2])
-    return fib_sequence[:n]
+@pure
+def vector_elementwise(op: str, a: list[float], b: list[float] = None) -> dict:
+    """Apply op to every element: exp, log, sqrt, abs, negative, square on a, or
+    add, subtract, multiply, divide, power, maximum, minimum of a and b (b may hold one value).
+    Returns {"values": [...]}"""
+    logger.debug("CALLED: vector_elementwise(op: str, a: list[float], b: list[float] = None) -> dict:")
+    from vector_math import elementwise
+
+    return {"values": elementwise(op, a, b)}
+
+@mcp.tool()
+@pure
+def vector_reduce(op: str, values: list[float]) -> float:
+    """Reduce a list to one number with op: sum, mean, min, max, prod, std, norm, logsumexp or expsum"""
+    logger.debug("CALLED: vector_reduce(op: str, values: list[float]) -> float:")
+    from vector_math import reduce
+
+    return reduce(op, values)
+
+@mcp.tool()
+@pure
+def fibonacci_numbers(n: int, offset: int = 0) -> dict:
+    """Return the first n Fibonacci Numbers. Long sequences come in chunks: a call returns
+    the values from index offset on, and while next_offset is not null, offset=next_offset
+    fetches the next chunk"""
+    logger.debug("CALLED: fibonacci_numbers(n: int, offset: int = 0) -> dict:")
+    values = bigmath.fibonacci_range(n, offset)
+    next_offset = offset + len(values)
+    return {"values": values, "next_offset": next_offset if values and next_offset < n else None}
 
 
 @mcp.tool()
 async def draw_rectangle(x1: int, y1: int, x2: int, y2: int) -> dict:
     """Draw a rectangle in Paint from (x1,y1) to (x2,y2)"""
-    global paint_app
     try:
-        if not paint_app:
+        if not paint.is_open():
             return {
                 "content": [
                     TextContent(
@@ -166,36 +286,9 @@ async def draw_rectangle(x1: int, y1: int, x2: int, y2: int) -> dict:
                     )
                 ]
             }
-        
-        # Get the Paint window
-        paint_window = paint_app.window(class_name='MSPaintApp')
-        
-        # Get primary monitor width to adjust coordinates
-        primary_width = GetSystemMetrics(0)
-        
-        # Ensure Paint window is active
-        if not paint_window.has_focus():
-            paint_window.set_focus()
-            time.sleep(1)
-        
-        # Click on the Rectangle tool using the correct coordinates for secondary screen
-        paint_window.click_input(coords=(640, 109 )) #640, 109
-        time.sleep(1)
-        
-        # Get the canvas area
-        canvas = paint_window.child_window(class_name='MSPaintView')
-        
-        # Draw rectangle - coordinates should already be relative to the Paint window
-        # No need to add primary_width since we're clicking within the Paint window
-        canvas.click_input(coords=(x1, y1))
-        time.sleep(1)
-        canvas.press_mouse_input(coords=(x1, y1)) #x1+2560, y1
-        time.sleep(1)
-        canvas.move_mouse_input(coords=(x2, y2))  #x2+2560, y2
-        time.sleep(1)
-        canvas.release_mouse_input(coords=(x2, y2)) #x2+2560, y2
-        time.sleep(1)
-        
+
+        await on_paint_thread(paint.draw_rectangle, x1, y1, x2, y2)
+
         return {
             "content": [
                 TextContent(
@@ -336,46 +429,53 @@ async def draw_rectangle(x1: int, y1: int, x2: int, y2: int) -> dict:
 @mcp.tool()
 async def add_text_in_paint(text: str) -> dict:
     """Add text in Paint"""
-    global paint_app
     try:
-        if not paint_app:
+        if not paint.is_open():
             return {
                 "content": [TextContent(type="text", text="Paint is not open. Please call open_paint first.")]
             }
 
-        paint_window = paint_app.window(class_name='MSPaintApp')
+        await on_paint_thread(paint.add_text, text)
+
+        return {
+            "content": [TextContent(type="text", text=f"Text '{text}' typed successfully into Paint")]
+        }
 
-        if not paint_window.has_focus():
-            paint_window.set_focus()
-            time.sleep(0.5)
+    except Exception as e:
+        return {
+            "content": [TextContent(type="text", text=f"Error: {str(e)}")]
+        }
 
-        # ✅ Step 1: Click on the Text Tool directly (DON’T use keyboard shortcuts!)
-        paint_window.click_input(coords=(428, 110))  # Adjust as per your Paint version
-        time.sleep(1)
 
-        # ✅ Step 2: Click inside the drawn rectangle
-        canvas = paint_window.child_window(class_name='MSPaintView')
 
-        paint_window.type_keys('t')
-        time.sleep(0.1)
-        paint_window.type_keys('x')
-        time.sleep(0.5)
-        
-        canvas.click_input(coords=(800, 400))  # Where your rectangle is
-        time.sleep(1)
+@mcp.tool()
+async def draw_batch(commands: list) -> dict:
+    """Draw several primitives in Paint in one call. Each command is a string like
+    "rect x1 y1 x2 y2", "line x1 y1 x2 y2", "ellipse x1 y1 x2 y2", "fill x y" or "text x y words"
+    (or a dict such as {"op": "rect", "x1": 780, "y1": 380, "x2": 1140, "y2": 700})"""
+    try:
+        if not paint.is_open():
+            return {
+                "content": [TextContent(type="text", text="Paint is not open. Please call open_paint first.")]
+            }
 
-        # ✅ Step 3: Type the text safely
-        safe_text = str(text).replace('%', '%%')
-        paint_window.type_keys(safe_text, with_spaces=True, pause=0.05, set_foreground=True)
-        time.sleep(1)
+        # Validate the whole batch before touching the canvas
+        parsed = []
+        for i, command in enumerate(commands):
+            try:
+                parsed.append(parse_draw_command(command, paint.size))
+            except ValueError as e:
+                raise ValueError(f"command {i + 1}: {e}")
+
+        count = await on_paint_thread(paint.run_batch, parsed)
 
         return {
-            "content": [TextContent(type="text", text=f"Text '{safe_text}' typed successfully into Paint")]
+            "content": [TextContent(type="text", text=f"Batch of {count} draw commands completed")]
         }
 
     except Exception as e:
         return {
-            "content": [TextContent(type="text", text=f"Error: {str(e)}")]
+            "content": [TextContent(type="text", text=f"Error drawing batch: {str(e)}")]
         }
 
 
@@ -383,35 +483,14 @@ async def add_text_in_paint(text: str) -> dict:
 @mcp.tool()
 async def open_paint() -> dict:
     """Open Microsoft Paint maximized on secondary monitor"""
-    global paint_app
     try:
-        paint_app = Application().start('mspaint.exe')
-        time.sleep(0.2)
-        
-        # Get the Paint window
-        paint_window = paint_app.window(class_name='MSPaintApp')
-        
-        # Get primary monitor width
-        primary_width = GetSystemMetrics(0)
-        
-        # First move to secondary monitor without specifying size
-        # win32gui.SetWindowPos(
-        #     paint_window.handle,
-        #     win32con.HWND_TOP,
-        #     primary_width + 1, 0,  # Position it on secondary monitor
-        #     0, 0,  # Let Windows handle the size
-        #     win32con.SWP_NOSIZE  # Don't change the size
-        # )
-        
-        # Now maximize the window
-        win32gui.ShowWindow(paint_window.handle, win32con.SW_MAXIMIZE)
-        time.sleep(1)
-        
+        message = await on_paint_thread(paint.open)
+
         return {
             "content": [
                 TextContent(
                     type="text",
-                    text="Paint opened successfully on secondary monitor and maximized"
+                    text=message
                 )
             ]
         }
@@ -430,15 +509,43 @@ async def open_paint() -> dict:
 @mcp.resource("greeting://{name}")
 def get_greeting(name: str) -> str:
     """Get a personalized greeting"""
-    print("CALLED: get_greeting(name: str) -> str:")
+    logger.debug("CALLED: get_greeting(name: str) -> str:")
     return f"Hello, {name}!"
 
 
+# Hit/miss counters of the pure-tool result cache
+@mcp.resource("cache://tool-results")
+def tool_result_cache_stats() -> str:
+    """Result cache metrics of the pure tools"""
+    return json.dumps(RESULT_CACHE.metrics(), indent=2)
+
+
+# Per-tool call counts, error counts and latency percentiles
+@mcp.resource("metrics://tools")
+def tool_metrics() -> str:
+    """Call counts, error counts and p50/p95/p99 latency per tool"""
+    return json.dumps(TOOL_METRICS.snapshot(), indent=2)
+
+
+@mcp.resource("canvas://png", mime_type="image/png")
+async def canvas_png() -> bytes:
+    """The current drawing as a PNG image (raster backend only)"""
+    if not hasattr(paint, "png_bytes"):
+        raise ValueError(f"The {paint.name} backend has no canvas image; start the server with --backend raster")
+    return await on_paint_thread(paint.png_bytes)
+
+
+@mcp.resource("metrics://prometheus", mime_type="text/plain")
+def tool_metrics_prometheus() -> str:
+    """Tool metrics in the Prometheus text format"""
+    return TOOL_METRICS.prometheus()
+
+
 # DEFINE AVAILABLE PROMPTS
 @mcp.prompt()
 def review_code(code: str) -> str:
     return f"Please review this code:\n\n{code}"
-    print("CALLED: review_code(code: str) -> str:")
+    logger.debug("CALLED: review_code(code: str) -> str:")
 
 
 @mcp.prompt()
@@ -449,10 +556,73 @@ def debug_error(error: str) -> list[base.Message]:
         base.AssistantMessage("I'll help debug that. What have you tried so far?"),
     ]
 
+_startup.append(("tools registered", time.perf_counter()))
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paint and math MCP tool server")
+    parser.add_argument("mode", nargs="?", help="pass 'dev' to run under the mcp dev command")
+    parser.add_argument("--backend", choices=sorted(BACKENDS),
+                        help="drawing backend for the Paint tools (default: $PAINT_BACKEND or windows)")
+    parser.add_argument("--dump-tools", action="store_true",
+                        help="precompute the client tool catalogue cache and exit")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http", "sse"], default="stdio",
+                        help="stdio serves one client; streamable-http (at /mcp) and sse (at /sse) serve many "
+                             "clients from one process")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="bind address for the network transports (local-only by default)")
+    parser.add_argument("--port", type=int, default=8000, help="port for the network transports")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print startup phase timings and an -X importtime breakdown to stderr and exit")
+    parser.add_argument("--prometheus-file",
+                        help="keep the tool metrics in this file in Prometheus text format (rewritten periodically and at exit)")
+    parser.add_argument("--prometheus-interval", type=float, default=15.0,
+                        help="seconds between rewrites of --prometheus-file")
+    parser.add_argument("--save-canvas", metavar="PATH",
+                        help="write the raster canvas to this image file when the server exits")
+    parser.add_argument("--trace-file", help="append a span for every tool call to this JSONL trace file")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "INFO"),
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"], type=str.upper,
+                        help="least severe messages to log (default: $LOG_LEVEL or INFO)")
+    parser.add_argument("--log-file", help="write the log to this file instead of stderr")
+    parser.add_argument("--debug-sample", type=int, default=1,
+                        help="keep only every Nth DEBUG message of each log statement")
+    args = parser.parse_args()
+    setup_logging(args.log_level, args.log_file, debug_sample=args.debug_sample)
+    paint = make_backend(args.backend)
+    _startup.append(("backend", time.perf_counter()))
+
+    if args.startup_report:
+        from startup_report import format_startup_report
+
+        print(format_startup_report(_startup, __file__), file=sys.stderr)
+        sys.exit(0)
+
+    if args.dump_tools:
+        from tool_cache import render_tools_description, save_tool_catalogue, server_fingerprint
+
+        tools = asyncio.run(mcp.list_tools())
+        path = save_tool_catalogue(server_fingerprint(), tools, render_tools_description(tools))
+        print(f"Tool catalogue written to {path}")
+        sys.exit(0)
+
+    if args.save_canvas:
+        if not hasattr(paint, "save"):
+            parser.error(f"--save-canvas needs the raster backend, not {paint.name}")
+        atexit.register(save_canvas, args.save_canvas)
+    if args.trace_file:
+        configure_tracing(args.trace_file, "server")
+    if args.prometheus_file:
+        start_prometheus_dump(TOOL_METRICS, args.prometheus_file, args.prometheus_interval)
+
     # Check if running with mcp dev command
-    print("STARTING THE SERVER AT AMAZING LOCATION")
-    if len(sys.argv) > 1 and sys.argv[1] == "dev":
+    logger.info("STARTING THE SERVER AT AMAZING LOCATION")
+    if args.mode == "dev":
         mcp.run()  # Run without transport for dev server
-    else:
+    elif args.transport == "stdio":
         mcp.run(transport="stdio")  # Run with stdio for direct execution
+    else:
+        # Network transport: one long-lived server for many concurrent clients.
+        # Note the Paint backend is process-wide, so clients share one canvas.
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        mcp.run(transport=args.transport)
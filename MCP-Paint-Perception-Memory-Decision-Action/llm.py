@@ -0,0 +1,410 @@
+import asyncio
+import json
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from call_parser import CallParser
+
+
+class FunctionCall:
+    """One structured tool call returned by a provider in native function-calling mode"""
+
+    def __init__(self, name: str, args: dict = None, call_id: str = None):
+        self.name = name
+        self.args = dict(args or {})
+        self.id = call_id
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "args": self.args}
+
+    def __repr__(self):
+        return f"FunctionCall({self.name}, {self.args})"
+
+
+class LLMResponse:
+    """
+    Minimal response object, exposes .text like the Gemini response. In native
+    function-calling mode function_calls holds the structured calls (possibly none).
+    """
+
+    def __init__(self, text: str = "", function_calls: list[FunctionCall] = None):
+        self.text = text
+        self.function_calls = function_calls
+
+
+class LLMProvider(ABC):
+    """
+    Text generation backend for the agent loop.
+    generate() is synchronous and takes Gemini-style contents
+    (a list of {"role": ..., "parts": [text]} turns).
+    """
+    name = "base"
+
+    @abstractmethod
+    def generate(self, contents) -> LLMResponse:
+        raise NotImplementedError
+
+    def use_tools(self, tools) -> None:
+        """Declare the MCP tools to the model and answer with structured calls from now on"""
+        raise ValueError(f"The {self.name} provider has no native function calling")
+
+
+def last_user_text(contents) -> str:
+    """Text of the most recent user turn"""
+    if isinstance(contents, str):
+        return contents
+    for turn in reversed(contents):
+        if turn.get("role") == "user":
+            return "\n".join(str(p) for p in turn.get("parts", []))
+    return ""
+
+
+# Schema keys function declarations accept; FastMCP schemas also carry titles, defaults and $defs
+DECLARATION_KEYS = {"type", "description", "properties", "required", "items", "enum", "format", "nullable"}
+
+
+def declaration_schema(schema: dict, root: dict = None, upper_types: bool = False) -> dict:
+    """A tool's JSON schema as a self-contained function-declaration schema: $refs inlined, Optional as nullable"""
+    root = root or schema
+    while "$ref" in schema:
+        schema = root.get("$defs", {}).get(schema["$ref"].rsplit("/", 1)[-1], {})
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        rest = {k: v for k, v in schema.items() if k != "anyOf"}
+        out = declaration_schema({**(options[0] if options else {"type": "string"}), **rest}, root, upper_types)
+        if len(options) < len(schema["anyOf"]):
+            out["nullable"] = True
+        return out
+    out = {k: v for k, v in schema.items() if k in DECLARATION_KEYS}
+    if upper_types and isinstance(out.get("type"), str):
+        out["type"] = out["type"].upper()
+    if "properties" in out:
+        out["properties"] = {k: declaration_schema(v, root, upper_types) for k, v in out["properties"].items()}
+    if "items" in out or str(out.get("type")).lower() == "array":
+        # Function declarations need typed items; an untyped list (list of anything) is sent as strings
+        out["items"] = declaration_schema(out.get("items") or {}, root, upper_types)
+        if "type" not in out["items"]:
+            out["items"]["type"] = "STRING" if upper_types else "string"
+    return out
+
+
+def tool_declarations(tools, upper_types: bool = False) -> list[dict]:
+    """Function declarations for MCP tools; tools without parameters declare none"""
+    declarations = []
+    for tool in tools:
+        declaration = {"name": tool.name, "description": tool.description or tool.name}
+        schema = tool.inputSchema or {}
+        if schema.get("properties"):
+            declaration["parameters"] = declaration_schema(schema, upper_types=upper_types)
+        declarations.append(declaration)
+    return declarations
+
+
+def gemini_response(response) -> LLMResponse:
+    """Text and function calls of a Gemini response, without touching .text (it raises on call-only replies)"""
+    parts = response.candidates[0].content.parts if response.candidates else []
+    calls = []
+    texts = []
+    for part in parts:
+        call = part.function_call
+        if call.name:
+            calls.append(FunctionCall(call.name, type(call).to_dict(call).get("args") or {}))
+        elif part.text:
+            texts.append(part.text)
+    return LLMResponse("".join(texts), calls)
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through google.generativeai"""
+    name = "gemini"
+
+    def __init__(self, system_prompt: str = None, model_name: str = "gemini-2.0-flash"):
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.native = False
+        self.model = genai.GenerativeModel(model_name=model_name, system_instruction=system_prompt)
+
+    def use_tools(self, tools):
+        import google.generativeai as genai
+
+        self.model = genai.GenerativeModel(
+            model_name=self.model_name,
+            system_instruction=self.system_prompt,
+            tools=[{"function_declarations": tool_declarations(tools, upper_types=True)}],
+        )
+        self.native = True
+
+    def generate(self, contents):
+        response = self.model.generate_content(contents)
+        return gemini_response(response) if self.native else response
+
+    async def generate_async(self, contents):
+        """Native async call, cancelling it on timeout does not leave a thread behind"""
+        response = await self.model.generate_content_async(contents)
+        return gemini_response(response) if self.native else response
+
+
+class ScriptedProvider(LLMProvider):
+    """Replays a fixed list of responses in order, for deterministic offline runs"""
+    name = "scripted"
+
+    def __init__(self, responses: list, loop: bool = False):
+        if not responses:
+            raise ValueError("ScriptedProvider needs at least one response")
+        self.responses = list(responses)
+        self.loop = loop
+        self.position = 0
+
+    @classmethod
+    def from_file(cls, path: str, loop: bool = False):
+        """
+        Load responses from a JSONL transcript, one {"response": text} object per line.
+        Lines with "function_calls" (recorded in native mode) replay as structured calls.
+        """
+        responses = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "function_calls" in record:
+                    responses.append(LLMResponse(record.get("response", ""), [
+                        FunctionCall(call["name"], call.get("args")) for call in record["function_calls"]
+                    ]))
+                elif "response" in record:
+                    responses.append(record["response"])
+        return cls(responses, loop=loop)
+
+    def generate(self, contents):
+        if self.position >= len(self.responses):
+            if not self.loop:
+                return LLMResponse("ERROR_HALT: scripted responses exhausted")
+            self.position = 0
+        response = self.responses[self.position]
+        self.position += 1
+        if isinstance(response, LLMResponse):
+            # Fresh argument dicts: the agent may modify them
+            calls = [FunctionCall(call.name, call.args) for call in response.function_calls]
+            return LLMResponse(response.text, calls)
+        return LLMResponse(response)
+
+    def use_tools(self, tools):
+        # The transcript already decides between text and structured calls
+        pass
+
+
+def _exp_sum_call(prompt):
+    match = re.findall(r"ascii_values[^\[]*\[([\d,\s]+)\]", prompt)
+    if not match:
+        return "ERROR_HALT: no ASCII values in the previous results"
+    values = ",".join(v.strip() for v in match[-1].split(","))
+    return f"FUNCTION_CALL: int_list_to_exponential_sum|input.int_list=[{values}]"
+
+
+def _add_text_call(prompt):
+    match = re.findall(r"int_list_to_exponential_sum.*?\"result\":\s*([-\d.e+]+)", prompt, re.S)
+    if not match:
+        return "ERROR_HALT: no exponential sum in the previous results"
+    return f'FUNCTION_CALL: add_text_in_paint|text="{match[-1]}"'
+
+
+# Rule table that walks the Paint task from the progress summary in the prompt
+PAINT_TASK_RULES = [
+    (r"Paint opened: False|Start with the first step", "FUNCTION_CALL: open_paint"),
+    (r"Rectangle drawn: False", "FUNCTION_CALL: draw_rectangle|x1=780|y1=380|x2=1140|y2=700"),
+    (r"ASCII calculated: False", "FUNCTION_CALL: strings_to_chars_to_int|input.string=Dhanush"),
+    (r"Exponential calculated: False", _exp_sum_call),
+    (r"Text added: False", _add_text_call),
+    (r"Text added: True", "FINAL_ANSWER: [done]"),
+]
+
+
+class RuleProvider(LLMProvider):
+    """
+    Answers from a rule table of (regex, response) pairs checked against the last user turn.
+    A response may be a string or a callable taking that turn's text.
+    """
+    name = "rules"
+
+    def __init__(self, rules=PAINT_TASK_RULES, default: str = "ERROR_HALT: no matching rule"):
+        self.rules = [(re.compile(pattern), response) for pattern, response in rules]
+        self.default = default
+        self.call_parser = None
+
+    def use_tools(self, tools):
+        # Stand-in for a function-calling model: rule answers become structured calls
+        self.call_parser = CallParser(tools)
+
+    def generate(self, contents):
+        prompt = last_user_text(contents)
+        text = self.default
+        for pattern, response in self.rules:
+            if pattern.search(prompt):
+                text = response(prompt) if callable(response) else response
+                break
+        if self.call_parser is None:
+            return LLMResponse(text)
+        if text.startswith("FUNCTION_CALL:"):
+            name, arguments = self.call_parser.parse(text.split(":", 1)[1])
+            return LLMResponse("", [FunctionCall(name, arguments)])
+        return LLMResponse(text, [])
+
+
+PROVIDERS = ["gemini", "rules", "scripted"]
+
+
+def make_provider(name: str = None, system_prompt: str = None, transcript: str = None) -> LLMProvider:
+    """Build the provider called name, defaulting to $LLM_PROVIDER or gemini"""
+    name = name or os.getenv("LLM_PROVIDER", "gemini")
+    if name == "gemini":
+        return GeminiProvider(system_prompt)
+    if name == "rules":
+        return RuleProvider()
+    if name == "scripted":
+        transcript = transcript or os.getenv("LLM_TRANSCRIPT")
+        if not transcript:
+            raise ValueError("The scripted provider needs a transcript file")
+        return ScriptedProvider.from_file(transcript)
+    raise ValueError(f"Unknown LLM provider: {name} (choose from {', '.join(PROVIDERS)})")
+
+
+class LLMExecutor:
+    """
+    Bounded, named thread pool for blocking model calls.
+    Tracks queue depth and in-flight calls. A call whose caller timed out keeps its
+    worker busy until the provider returns; those are counted as abandoned so a
+    starved pool is visible. Calls still queued when their caller gives up are cancelled.
+    Native async calls (run_async) share the same max_workers bound and counters.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-call")
+        self._lock = threading.Lock()
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self.queued = 0
+        self.running = 0
+        self.abandoned = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    def _call(self, fn, state):
+        with self._lock:
+            if state["cancelled"]:
+                return None
+            state["started"] = True
+            self.queued -= 1
+            self.running += 1
+        try:
+            result = fn()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.completed += 1
+            return result
+        finally:
+            with self._lock:
+                state["done"] = True
+                self.running -= 1
+                if state["abandoned"]:
+                    self.abandoned -= 1
+
+    async def run(self, fn, timeout: float = None):
+        """Run fn() on the pool and await it, raising TimeoutError after timeout seconds"""
+        state = {"started": False, "done": False, "cancelled": False, "abandoned": False}
+        with self._lock:
+            self.queued += 1
+        future = self._pool.submit(self._call, fn, state)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timed_out += 1
+                if not state["started"]:
+                    state["cancelled"] = True
+                    self.queued -= 1
+                    self.cancelled += 1
+                elif not state["done"]:
+                    state["abandoned"] = True
+                    self.abandoned += 1
+            raise
+
+    async def run_async(self, make_call, timeout: float = None):
+        """
+        Await make_call() once one of the max_workers slots is free, raising TimeoutError
+        after timeout seconds. A timed-out call is cancelled outright, so none are abandoned.
+        """
+        state = {"started": False}
+
+        async def call():
+            async with self._slots:
+                with self._lock:
+                    state["started"] = True
+                    self.queued -= 1
+                    self.running += 1
+                try:
+                    result = await make_call()
+                except Exception:
+                    with self._lock:
+                        self.failed += 1
+                    raise
+                else:
+                    with self._lock:
+                        self.completed += 1
+                    return result
+                finally:
+                    with self._lock:
+                        self.running -= 1
+
+        with self._lock:
+            self.queued += 1
+        try:
+            return await asyncio.wait_for(call(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timed_out += 1
+                if not state["started"]:
+                    self.queued -= 1
+                    self.cancelled += 1
+            raise
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "abandoned": self.abandoned,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "cancelled": self.cancelled,
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor = None
+
+
+def get_llm_executor() -> LLMExecutor:
+    """Process-wide executor shared by every agent in this process"""
+    global _executor
+    if _executor is None:
+        _executor = LLMExecutor()
+    return _executor
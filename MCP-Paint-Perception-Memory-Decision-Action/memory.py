@@ -0,0 +1,140 @@
+from collections import deque
+
+# Rough size estimate, good enough for budgeting English text and numbers
+CHARS_PER_TOKEN = 4
+
+# Which tool completes which step of the Paint task
+STEP_TOOLS = {
+    "open_paint": "paint_opened",
+    "draw_rectangle": "rectangle_drawn",
+    "strings_to_chars_to_int": "ascii_calculated",
+    "int_list_to_exponential_sum": "exponential_calculated",
+    "add_text_in_paint": "text_added",
+}
+
+STEP_LABELS = [
+    ("paint_opened", "Paint opened"),
+    ("rectangle_drawn", "Rectangle drawn"),
+    ("ascii_calculated", "ASCII calculated"),
+    ("exponential_calculated", "Exponential calculated"),
+    ("text_added", "Text added"),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def shorten(text: str, max_chars: int) -> str:
+    """Keep the start and end of text, eliding the middle"""
+    if len(text) <= max_chars:
+        return text
+    keep = max(0, max_chars - 5)
+    head = keep * 2 // 3
+    return f"{text[:head]} ... {text[len(text) - (keep - head):]}"
+
+
+class StepState:
+    """Structured progress through the task, kept apart from the free-text history"""
+
+    def __init__(self):
+        self.steps_completed = {key: False for key, _ in STEP_LABELS}
+
+    def record(self, func_name: str) -> None:
+        step = STEP_TOOLS.get(func_name)
+        if step:
+            self.steps_completed[step] = True
+
+    def summary(self) -> str:
+        lines = ["Steps completed so far:"]
+        for i, (key, label) in enumerate(STEP_LABELS, start=1):
+            lines.append(f"{i}. {label}: {self.steps_completed[key]}")
+        return "\n".join(lines) + "\n"
+
+
+class AgentMemory:
+    """
+    Tool history for a conversation whose window drops old turns.
+    take_unsent() hands out each new result once (capped at max_item_chars) for the next
+    user turn. When the conversation drops that turn, turn_dropped() compacts its results
+    to one short line each; render() is those lines, sent with every later turn so no result
+    leaves the model's view entirely, and the oldest are omitted once they exceed token_budget.
+    """
+
+    def __init__(self, token_budget: int = 600, max_item_chars: int = 600, summary_chars: int = 120):
+        self.token_budget = token_budget
+        self.max_item_chars = max_item_chars
+        self.summary_chars = summary_chars
+        self.unsent = []
+        # Results of each unpinned user turn still in the conversation window, oldest first
+        self.in_window = deque()
+        self.summaries = deque()
+        self.dropped = 0
+        self.added = 0
+        self.steps = StepState()
+
+    def __len__(self) -> int:
+        return self.added
+
+    def add(self, text: str) -> None:
+        """Remember one tool result or error"""
+        self.unsent.append(shorten(text, self.max_item_chars))
+        self.added += 1
+
+    def take_unsent(self, pinned: bool = False) -> str:
+        """
+        Results added since the previous call, or an empty string. Call once per user turn;
+        pinned turns are never dropped from the window, so their results are not tracked.
+        """
+        batch, self.unsent = self.unsent, []
+        if not pinned:
+            self.in_window.append(batch)
+        return "New tool outputs:\n" + "\n".join(batch) if batch else ""
+
+    def turn_dropped(self) -> None:
+        """The oldest tracked user turn left the conversation window; keep its results as summaries"""
+        if not self.in_window:
+            return
+        self.summaries.extend(shorten(text, self.summary_chars) for text in self.in_window.popleft())
+        while self.summaries and estimate_tokens(self.render()) > self.token_budget:
+            self.summaries.popleft()
+            self.dropped += 1
+
+    def render(self) -> str:
+        """Summaries of the results no longer in the window, within token_budget"""
+        if not (self.summaries or self.dropped):
+            return ""
+        header = "Earlier tool outputs (summarized"
+        header += f", {self.dropped} older omitted):" if self.dropped else "):"
+        return "\n".join([header] + [f"- {line}" for line in self.summaries])
+
+    def history_for_turn(self, pinned: bool = False) -> str:
+        """Tool history for the next user turn: the summaries, then the new results"""
+        return "\n".join(part for part in (self.render(), self.take_unsent(pinned)) if part)
+
+
+if __name__ == "__main__":
+    # Benchmark: history bytes sent per request over a long episode, the old joined list
+    # re-sent every turn vs. the windowed conversation carrying AgentMemory's turns
+    from conversation import Conversation
+
+    unbounded = []
+    memory = AgentMemory()
+    conversation = Conversation("system prompt", max_turns=4,
+                                on_drop=lambda role, text: role == "user" and memory.turn_dropped())
+    checkpoints = {1, 10, 50, 100, 500, 1000, 5000}
+    print(f"{'steps':>6} {'joined list (bytes)':>20} {'conversation (bytes)':>21}")
+    for i in range(1, max(checkpoints) + 1):
+        entry = (
+            f"In the {i} iteration you called strings_to_chars_to_int with "
+            f"{{'input': {{'string': 'Dhanush{i}'}}}} parameters, and the function returned "
+            f"[{{\"ascii_values\": {[68, 104, 97, 110, 117, 115, 104] + [ord(c) for c in str(i)]}}}]."
+        )
+        unbounded.append(entry)
+        pinned = not conversation.turns
+        conversation.add_user(f"{memory.steps.summary()}\n{memory.history_for_turn(pinned)}")
+        _, stats = conversation.next_request()
+        conversation.add_model(f"FUNCTION_CALL: strings_to_chars_to_int|input.string=Dhanush{i}")
+        memory.add(entry)
+        if i in checkpoints:
+            print(f"{i:>6} {len(chr(10).join(unbounded)):>20} {stats['history_bytes']:>21}")
@@ -0,0 +1,426 @@
+import bisect
+import io
+import os
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+from paint_wait import (ensure_focus, grab_canvas, wait_for_canvas_change, wait_for_maximized, wait_for_mouse_up,
+                        wait_for_responsive, wait_for_window)
+
+# Toolbar and canvas coordinates used by the Paint tools (Windows 11 Paint, maximized)
+# Adjust as per your Paint version
+RECTANGLE_TOOL = (640, 109)
+ELLIPSE_TOOL = (620, 109)
+LINE_TOOL = (580, 109)
+FILL_TOOL = (408, 110)
+TEXT_TOOL = (428, 110)
+TEXT_POSITION = (800, 400)
+# Area right of and below the text position watched for typed text to appear
+TEXT_BOX = (400, 60)
+
+# Number of integer coordinates each draw_batch primitive takes, and its toolbar button
+DRAW_OPS = {"rect": 4, "line": 4, "ellipse": 4, "fill": 2, "text": 2}
+TOOL_BUTTONS = {"rect": RECTANGLE_TOOL, "line": LINE_TOOL, "ellipse": ELLIPSE_TOOL,
+                "fill": FILL_TOOL, "text": TEXT_TOOL}
+
+DEFAULT_CANVAS_SIZE = (1920, 1080)
+
+
+class PaintNotOpenError(RuntimeError):
+    """Raised when a drawing call is made before open_paint"""
+
+    def __init__(self):
+        super().__init__("Paint is not open. Please call open_paint first.")
+
+
+class DrawCommand(NamedTuple):
+    """One primitive of a draw_batch call"""
+    op: str
+    coords: tuple
+    text: str = ""
+
+
+def parse_draw_command(command, size=None) -> DrawCommand:
+    """
+    Parse a draw_batch primitive given either compactly or as a dict. With size (width,
+    height), coordinates off that canvas are rejected:
+      "rect 780 380 1140 700"   {"op": "rect", "x1": 780, "y1": 380, "x2": 1140, "y2": 700}
+      "line x1 y1 x2 y2"        {"op": "line", ...}
+      "ellipse x1 y1 x2 y2"     {"op": "ellipse", ...}
+      "fill x y"                {"op": "fill", "x": 900, "y": 500}
+      "text x y any words"      {"op": "text", "x": 800, "y": 400, "text": "any words"}
+    """
+    if isinstance(command, dict):
+        op = command.get("op")
+        if op not in DRAW_OPS:
+            raise ValueError(f"Unknown draw op: {op}")
+        keys = ("x1", "y1", "x2", "y2") if DRAW_OPS[op] == 4 else ("x", "y")
+        missing = [k for k in keys if k not in command]
+        if missing:
+            raise ValueError(f"{op} is missing {', '.join(missing)}")
+        coords = tuple(int(command[k]) for k in keys)
+        text = str(command.get("text", ""))
+    else:
+        parts = str(command).split()
+        op = parts[0] if parts else ""
+        if op not in DRAW_OPS:
+            raise ValueError(f"Unknown draw op: {op}")
+        n = DRAW_OPS[op]
+        if op == "text":
+            parts = str(command).split(None, n + 1)
+        if len(parts) < n + 1:
+            raise ValueError(f"{op} needs {n} coordinates: {command}")
+        coords = tuple(int(v) for v in parts[1:n + 1])
+        text = parts[n + 1] if op == "text" and len(parts) > n + 1 else ""
+        if op != "text" and len(parts) > n + 1:
+            raise ValueError(f"Too many values for {op}: {command}")
+    if size is not None:
+        width, height = size
+        for x, y in zip(coords[::2], coords[1::2]):
+            if not (0 <= x < width and 0 <= y < height):
+                raise ValueError(f"({x},{y}) is outside the {width}x{height} canvas: {command}")
+    return DrawCommand(op, coords, text)
+
+
+class PaintBackend(ABC):
+    """
+    Drawing surface behind the Paint tools.
+    Coordinates are canvas-relative, the same ones the agent passes to draw_rectangle.
+    A subclass must implement every abstract method before it can be instantiated.
+    """
+    name = "base"
+    size = DEFAULT_CANVAS_SIZE
+
+    @abstractmethod
+    def is_open(self) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def open(self) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def draw_rectangle(self, x1: int, y1: int, x2: int, y2: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_text(self, text: str, position=TEXT_POSITION) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def draw_line(self, x1: int, y1: int, x2: int, y2: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def draw_ellipse(self, x1: int, y1: int, x2: int, y2: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def fill(self, x: int, y: int) -> None:
+        raise NotImplementedError
+
+    def _run_command(self, cmd: DrawCommand) -> None:
+        if cmd.op == "rect":
+            self.draw_rectangle(*cmd.coords)
+        elif cmd.op == "line":
+            self.draw_line(*cmd.coords)
+        elif cmd.op == "ellipse":
+            self.draw_ellipse(*cmd.coords)
+        elif cmd.op == "fill":
+            self.fill(*cmd.coords)
+        elif cmd.op == "text":
+            self.add_text(cmd.text, cmd.coords)
+
+    def run_batch(self, commands: list[DrawCommand]) -> int:
+        """Execute parsed commands in order, returns how many ran"""
+        for cmd in commands:
+            self._run_command(cmd)
+        return len(commands)
+
+
+class WindowsPaintBackend(PaintBackend):
+    """
+    Drives a live mspaint.exe window through pywinauto.
+    Drawing input is acknowledged by its effect: the affected canvas pixels are captured
+    before the input and polled until they differ. The clock and the probes can be replaced,
+    e.g. to run against a fake window without Windows: idle_probe(canvas) -> bool,
+    mouse_probe() -> bool (left button up) and snapshot(canvas, box) -> pixels.
+    """
+    name = "windows"
+
+    def __init__(self, clock=None, idle_probe=None, mouse_probe=None, snapshot=None):
+        self.app = None
+        self.clock = clock
+        self.idle_probe = idle_probe
+        self.mouse_probe = mouse_probe
+        self.snapshot = snapshot or grab_canvas
+
+    def is_open(self) -> bool:
+        return self.app is not None
+
+    def _window(self):
+        if not self.app:
+            raise PaintNotOpenError()
+        return self.app.window(class_name='MSPaintApp')
+
+    def open(self) -> str:
+        from pywinauto.application import Application
+        import win32gui
+        import win32con
+
+        self.app = Application().start('mspaint.exe')
+
+        # Wait for the Paint window to be created instead of guessing a delay
+        paint_window = wait_for_window(self.app, 'MSPaintApp', clock=self.clock)
+
+        # First move to secondary monitor without specifying size
+        # win32gui.SetWindowPos(
+        #     paint_window.handle,
+        #     win32con.HWND_TOP,
+        #     primary_width + 1, 0,  # Position it on secondary monitor
+        #     0, 0,  # Let Windows handle the size
+        #     win32con.SWP_NOSIZE  # Don't change the size
+        # )
+
+        # Now maximize the window
+        win32gui.ShowWindow(paint_window.handle, win32con.SW_MAXIMIZE)
+        wait_for_maximized(paint_window, clock=self.clock)
+        return "Paint opened successfully on secondary monitor and maximized"
+
+    def _begin(self):
+        """Focus Paint once and return (window, canvas)"""
+        paint_window = self._window()
+
+        # Ensure Paint window is active
+        ensure_focus(paint_window, clock=self.clock)
+
+        canvas = paint_window.child_window(class_name='MSPaintView')
+        return paint_window, canvas
+
+    def _responsive(self, canvas):
+        wait_for_responsive(canvas, clock=self.clock, probe=self.idle_probe)
+
+    def _until_changed(self, canvas, box, send_input):
+        """Send input and wait until it shows in box (canvas-relative x1, y1, x2, y2)"""
+        box = tuple(max(0, v) for v in box)
+        before = self.snapshot(canvas, box)
+        send_input()
+        wait_for_canvas_change(lambda: self.snapshot(canvas, box), before, clock=self.clock)
+
+    def _select_tool(self, paint_window, canvas, coords):
+        # Tool buttons leave the canvas as it is; all there is to wait for is a responsive UI
+        paint_window.click_input(coords=coords)
+        self._responsive(canvas)
+        if coords == TEXT_TOOL:
+            # Confirm the Text tool with the ribbon shortcut
+            paint_window.type_keys('t')
+            self._responsive(canvas)
+            paint_window.type_keys('x')
+            self._responsive(canvas)
+
+    def _drag(self, canvas, x1, y1, x2, y2):
+        # Coordinates are relative to the canvas
+        canvas.click_input(coords=(x1, y1))
+        canvas.press_mouse_input(coords=(x1, y1))
+        canvas.move_mouse_input(coords=(x2, y2))
+
+        def release():
+            canvas.release_mouse_input(coords=(x2, y2))
+            wait_for_mouse_up(clock=self.clock, probe=self.mouse_probe)
+
+        # The shape appearing is what shows Paint has handled the whole drag
+        self._until_changed(canvas, (min(x1, x2) - 2, min(y1, y2) - 2, max(x1, x2) + 3, max(y1, y2) + 3), release)
+
+    def _type_text(self, paint_window, canvas, text, position):
+        # Click inside the drawn rectangle to place the text box
+        x, y = position
+        canvas.click_input(coords=(x, y))
+        self._responsive(canvas)
+
+        # pywinauto treats % as a modifier, so escape it before typing
+        safe_text = str(text).replace('%', '%%')
+        self._until_changed(canvas, (x, y, x + TEXT_BOX[0], y + TEXT_BOX[1]), lambda: paint_window.type_keys(
+            safe_text, with_spaces=True, pause=0.05, set_foreground=True))
+
+    def _click(self, canvas, x, y):
+        self._until_changed(canvas, (x - 2, y - 2, x + 3, y + 3), lambda: canvas.click_input(coords=(x, y)))
+
+    def draw_rectangle(self, x1, y1, x2, y2):
+        paint_window, canvas = self._begin()
+        self._select_tool(paint_window, canvas, RECTANGLE_TOOL)
+        self._drag(canvas, x1, y1, x2, y2)
+
+    def draw_line(self, x1, y1, x2, y2):
+        paint_window, canvas = self._begin()
+        self._select_tool(paint_window, canvas, LINE_TOOL)
+        self._drag(canvas, x1, y1, x2, y2)
+
+    def draw_ellipse(self, x1, y1, x2, y2):
+        paint_window, canvas = self._begin()
+        self._select_tool(paint_window, canvas, ELLIPSE_TOOL)
+        self._drag(canvas, x1, y1, x2, y2)
+
+    def fill(self, x, y):
+        paint_window, canvas = self._begin()
+        self._select_tool(paint_window, canvas, FILL_TOOL)
+        self._click(canvas, x, y)
+
+    def add_text(self, text, position=TEXT_POSITION):
+        paint_window, canvas = self._begin()
+        self._select_tool(paint_window, canvas, TEXT_TOOL)
+        self._type_text(paint_window, canvas, text, position)
+
+    def run_batch(self, commands):
+        """Focus once, and only click a toolbar button when the primitive type changes"""
+        paint_window, canvas = self._begin()
+        selected = None
+        for cmd in commands:
+            tool = TOOL_BUTTONS[cmd.op]
+            # Clicking the canvas commits a text box, so every text needs a fresh Text tool
+            if tool != selected or tool == TEXT_TOOL:
+                self._select_tool(paint_window, canvas, tool)
+                selected = tool
+            if cmd.op == "fill":
+                self._click(canvas, *cmd.coords)
+            elif cmd.op == "text":
+                self._type_text(paint_window, canvas, cmd.text, cmd.coords)
+            else:
+                self._drag(canvas, *cmd.coords)
+        return len(commands)
+
+
+def flood_runs(mask, x: int, y: int):
+    """
+    Horizontal runs (row, start, end) of the 4-connected region of True pixels in mask that
+    contains (x, y). Runs are found for every row at once with NumPy; only the walk over
+    touching runs is Python, so the cost follows the number of runs, not of pixels.
+    """
+    import numpy as np
+
+    if not mask[y, x]:
+        return []
+    edges = np.diff(np.pad(mask, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+    # Index range of each row's runs (rows come out sorted)
+    bounds = np.searchsorted(rows, np.arange(mask.shape[0] + 1))
+    starts, ends, bounds = starts.tolist(), ends.tolist(), bounds.tolist()
+
+    first = bounds[y] + bisect.bisect_right(starts[bounds[y]:bounds[y + 1]], x) - 1
+    seen = {first}
+    stack = [(y, first)]
+    runs = []
+    while stack:
+        row, i = stack.pop()
+        start, end = starts[i], ends[i]
+        runs.append((row, start, end))
+        for next_row in (row - 1, row + 1):
+            if not 0 <= next_row < mask.shape[0]:
+                continue
+            lo, hi = bounds[next_row], bounds[next_row + 1]
+            # Runs of the next row that share at least one column with [start, end)
+            j = bisect.bisect_right(ends, start, lo, hi)
+            while j < hi and starts[j] < end:
+                if j not in seen:
+                    seen.add(j)
+                    stack.append((next_row, j))
+                j += 1
+    return runs
+
+
+class RasterPaintBackend(PaintBackend):
+    """In-process PIL canvas with the same coordinate system as the Paint canvas"""
+    name = "raster"
+
+    def __init__(self, size=DEFAULT_CANVAS_SIZE, outline="black", width=1):
+        self.size = size
+        self.outline = outline
+        self.width = width
+        self.image = None
+        self._draw = None
+
+    def is_open(self) -> bool:
+        return self.image is not None
+
+    def open(self) -> str:
+        from PIL import Image, ImageDraw
+
+        self.image = Image.new("RGB", self.size, "white")
+        self._draw = ImageDraw.Draw(self.image)
+        return f"Raster canvas opened at {self.size[0]}x{self.size[1]}"
+
+    def _canvas(self):
+        if self._draw is None:
+            raise PaintNotOpenError()
+        return self._draw
+
+    @staticmethod
+    def _box(x1, y1, x2, y2):
+        # Paint lets you drag in any direction, PIL wants top-left first
+        return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+    def draw_rectangle(self, x1, y1, x2, y2):
+        self._canvas().rectangle(self._box(x1, y1, x2, y2), outline=self.outline, width=self.width)
+
+    def draw_ellipse(self, x1, y1, x2, y2):
+        self._canvas().ellipse(self._box(x1, y1, x2, y2), outline=self.outline, width=self.width)
+
+    def draw_line(self, x1, y1, x2, y2):
+        self._canvas().line((x1, y1, x2, y2), fill=self.outline, width=self.width)
+
+    def fill(self, x, y):
+        # Same result as ImageDraw.floodfill (4-connected, exact color match), which is pure
+        # Python per pixel and took seconds on a blank canvas
+        import numpy as np
+        from PIL import Image, ImageColor, ImageDraw
+
+        self._canvas()
+        width, height = self.image.size
+        if not (0 <= x < width and 0 <= y < height):
+            raise ValueError(f"({x},{y}) is outside the {width}x{height} canvas")
+        pixels = np.array(self.image)
+        mask = (pixels == pixels[y, x]).all(axis=2)
+        color = ImageColor.getrgb(self.outline)
+        for row, start, end in flood_runs(mask, x, y):
+            pixels[row, start:end] = color
+        self.image = Image.fromarray(pixels)
+        self._draw = ImageDraw.Draw(self.image)
+
+    def add_text(self, text, position=TEXT_POSITION):
+        self._canvas().text(tuple(position), str(text), fill=self.outline)
+
+    def save(self, path: str) -> None:
+        """Write the current canvas to an image file"""
+        if self.image is None:
+            raise PaintNotOpenError()
+        self.image.save(path)
+
+    def png_bytes(self) -> bytes:
+        """Return the current canvas encoded as PNG"""
+        if self.image is None:
+            raise PaintNotOpenError()
+        buffer = io.BytesIO()
+        self.image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def as_array(self):
+        """Return the canvas as a (height, width, 3) uint8 NumPy array"""
+        import numpy as np
+
+        if self.image is None:
+            raise PaintNotOpenError()
+        return np.asarray(self.image)
+
+
+BACKENDS = {
+    WindowsPaintBackend.name: WindowsPaintBackend,
+    RasterPaintBackend.name: RasterPaintBackend,
+}
+
+
+def make_backend(name: str = None) -> PaintBackend:
+    """Build the backend called name, defaulting to $PAINT_BACKEND or windows"""
+    name = name or os.getenv("PAINT_BACKEND", WindowsPaintBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown paint backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
@@ -0,0 +1,149 @@
+import functools
+import time
+
+
+class SystemClock:
+    """Monotonic wall clock used by the readiness waits"""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+default_clock = SystemClock()
+
+# Poll schedule: start fast, back off geometrically, never sleep longer than max_interval
+DEFAULT_TIMEOUT = 5.0
+INITIAL_INTERVAL = 0.01
+MAX_INTERVAL = 0.2
+BACKOFF = 2.0
+# How long input that should change the canvas may take to show. Input can legitimately
+# change nothing (a fill on its own color, a shape drawn over itself), so this is not an error
+CHANGE_TIMEOUT = 1.0
+
+VK_LBUTTON = 0x01
+WM_NULL = 0x0000
+SMTO_ABORTIFHUNG = 0x0002
+
+
+@functools.lru_cache(maxsize=None)
+def not_ready_errors() -> tuple:
+    """
+    pywinauto / pywin32 errors that mean a window or control is not there yet. Empty when
+    those packages are missing: then nothing can raise them, and an import error in a probe
+    must surface instead of reading as "not ready".
+    """
+    try:
+        import pywintypes
+        from pywinauto.findwindows import ElementAmbiguousError, ElementNotFoundError
+    except ImportError:
+        return ()
+    return (ElementNotFoundError, ElementAmbiguousError, pywintypes.error)
+
+
+def wait_until(predicate, timeout=DEFAULT_TIMEOUT, description="condition", clock=None,
+               interval=INITIAL_INTERVAL, max_interval=MAX_INTERVAL, backoff=BACKOFF, retry_on=None):
+    """
+    Poll predicate() with exponential backoff until it returns a truthy value.
+    Exceptions of the types in retry_on (default: not_ready_errors()) count as "not ready yet";
+    any other exception propagates at once.
+    Returns the truthy value, raises TimeoutError once timeout seconds have passed.
+    """
+    clock = clock or default_clock
+    retry_on = not_ready_errors() if retry_on is None else retry_on
+    deadline = clock.now() + timeout
+    while True:
+        try:
+            result = predicate()
+        except retry_on:
+            result = None
+        if result:
+            return result
+        remaining = deadline - clock.now()
+        if remaining <= 0:
+            raise TimeoutError(f"Timed out after {timeout}s waiting for {description}")
+        clock.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+def ui_thread_responsive(canvas, timeout_ms=50) -> bool:
+    """
+    True when the window's UI thread answers a sent WM_NULL. Sent messages are handled
+    before queued input, so this shows Paint is not hung or busy, not that it has consumed
+    earlier clicks and drags; for those, wait for their effect on the canvas.
+    """
+    import pywintypes
+    import win32gui
+
+    try:
+        win32gui.SendMessageTimeout(canvas.handle, WM_NULL, 0, 0, SMTO_ABORTIFHUNG, timeout_ms)
+        return True
+    except pywintypes.error:
+        return False
+
+
+def left_button_up() -> bool:
+    """True when the OS input state has the left button released (the injected release is in, not yet handled)"""
+    import win32api
+
+    return not (win32api.GetAsyncKeyState(VK_LBUTTON) & 0x8000)
+
+
+def grab_canvas(canvas, box) -> bytes:
+    """Screen pixels of the canvas-relative box (x1, y1, x2, y2)"""
+    from PIL import ImageGrab
+
+    rect = canvas.rectangle()
+    x1, y1, x2, y2 = box
+    return ImageGrab.grab(bbox=(rect.left + x1, rect.top + y1, rect.left + x2, rect.top + y2)).tobytes()
+
+
+def wait_for_window(app, class_name, timeout=10.0, clock=None):
+    """Wait until the app has a visible, enabled top-level window of class_name"""
+    window = app.window(class_name=class_name)
+    wait_until(lambda: window.exists() and window.is_visible() and window.is_enabled(),
+               timeout=timeout, description=f"window {class_name}", clock=clock)
+    return window
+
+
+def wait_for_maximized(window, timeout=DEFAULT_TIMEOUT, clock=None):
+    """Wait until the window reports the maximized state"""
+    wait_until(window.is_maximized, timeout=timeout,
+               description="window to maximize", clock=clock)
+    return window
+
+
+def ensure_focus(window, timeout=DEFAULT_TIMEOUT, clock=None):
+    """Focus the window if needed and wait until it actually has focus"""
+    if not window.has_focus():
+        window.set_focus()
+        wait_until(window.has_focus, timeout=timeout,
+                   description="window focus", clock=clock)
+    return window
+
+
+def wait_for_responsive(canvas, timeout=DEFAULT_TIMEOUT, clock=None, probe=None):
+    """Wait until the canvas' UI thread answers (see ui_thread_responsive for what that does not show)"""
+    probe = probe or ui_thread_responsive
+    wait_until(lambda: probe(canvas), timeout=timeout, description="canvas to respond", clock=clock)
+    return canvas
+
+
+def wait_for_mouse_up(timeout=DEFAULT_TIMEOUT, clock=None, probe=None):
+    """Wait until the OS input state has the left button released"""
+    wait_until(probe or left_button_up, timeout=timeout,
+               description="mouse button release", clock=clock)
+
+
+def wait_for_canvas_change(snapshot, before, timeout=CHANGE_TIMEOUT, clock=None) -> bool:
+    """
+    Wait until snapshot() differs from before, the pixels taken ahead of the input: the
+    evidence that Paint has handled it. False when nothing changed within timeout.
+    """
+    try:
+        wait_until(lambda: snapshot() != before, timeout=timeout, description="canvas change", clock=clock)
+        return True
+    except TimeoutError:
+        return False
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import re
+
+from atomic_file import write_atomic
+from dispatch import ToolCall, check_graph
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PLAN_DIR = os.path.join(HERE, ".plan_cache")
+PLAN_VERSION = 1
+
+
+def _source_hash(path: str = __file__) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# The templates and builders live in this file: editing it invalidates every cached plan
+PLANNER_SOURCE_HASH = _source_hash()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Collapse whitespace and fix the spacing around brackets and punctuation.
+    Case is kept: the words of a query (e.g. the one converted to ASCII) change the result.
+    """
+    query = re.sub(r"\s+", " ", query.strip())
+    query = re.sub(r"\s*\(\s*", "(", query)
+    query = re.sub(r"\s*([),.])", r"\1", query)
+    query = re.sub(r",(?=\S)", ", ", query)
+    return query
+
+
+def _paint_exp_sum_plan(match) -> list[ToolCall]:
+    x1, y1, x2, y2 = (int(match.group(name)) for name in ("x1", "y1", "x2", "y2"))
+    return [
+        ToolCall("paint", "open_paint", {}),
+        ToolCall("rect", "draw_rectangle", {"x1": x1, "y1": y1, "x2": x2, "y2": y2}, after=["paint"]),
+        ToolCall("ascii", "strings_to_chars_to_int", {"input": {"string": match.group("word")}}),
+        ToolCall("exp", "int_list_to_exponential_sum", {"input": {"int_list": "$ascii.ascii_values"}}),
+        ToolCall("text", "add_text_in_paint", {"text": "$exp"}, after=["rect"]),
+    ]
+
+
+# (regex over the normalized query, builder taking the match) for every known task shape
+PLAN_TEMPLATES = [
+    (
+        r"open paint\b.*draw a rectangle from\((?P<x1>\d+), (?P<y1>\d+)\) to\((?P<x2>\d+), (?P<y2>\d+)\)"
+        r".*exponentials of the ascii values of the word (?P<word>\w+)"
+        r".*add this sum as text inside the rectangle",
+        _paint_exp_sum_plan,
+    ),
+]
+
+
+def compile_plan(query: str, templates=PLAN_TEMPLATES) -> list[ToolCall] | None:
+    """Compile a query into a DAG of tool calls, or None if no template recognizes it"""
+    normalized = normalize_query(query)
+    for pattern, build in templates:
+        match = re.search(pattern, normalized, re.IGNORECASE)
+        if match:
+            plan = build(match)
+            check_graph(plan)
+            return plan
+    return None
+
+
+def plan_key(query: str, fingerprint: str) -> str:
+    """Cache key: the normalized query, the server fingerprint the plan was compiled against and the planner source"""
+    raw = f"v{PLAN_VERSION}\n{PLANNER_SOURCE_HASH}\n{fingerprint}\n{normalize_query(query)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def plan_to_dicts(plan: list[ToolCall]) -> list[dict]:
+    return [{"id": c.id, "name": c.name, "arguments": c.arguments, "after": sorted(c.after)} for c in plan]
+
+
+def plan_from_dicts(calls: list[dict]) -> list[ToolCall]:
+    return [ToolCall(c["id"], c["name"], c["arguments"], c.get("after", ())) for c in calls]
+
+
+def _plan_path(key: str, plan_dir: str) -> str:
+    return os.path.join(plan_dir, f"plan-{key[:16]}.json")
+
+
+def load_plan(key: str, plan_dir: str = PLAN_DIR) -> list[ToolCall] | None:
+    """Return the compiled plan stored under key, or None on a miss"""
+    try:
+        with open(_plan_path(key, plan_dir), encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("key") != key:
+            return None
+        return plan_from_dicts(data["calls"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_plan(key: str, query: str, plan: list[ToolCall], plan_dir: str = PLAN_DIR) -> str:
+    """Write a compiled plan atomically"""
+    os.makedirs(plan_dir, exist_ok=True)
+    path = _plan_path(key, plan_dir)
+    data = {
+        "key": key,
+        "query": normalize_query(query),
+        "calls": plan_to_dicts(plan),
+    }
+    write_atomic(path, json.dumps(data))
+    return path
+
+
+def get_plan(query: str, fingerprint: str, plan_dir: str = PLAN_DIR):
+    """
+    Return (plan, source) where source is "cache" or "compiled",
+    or (None, None) when the query is not a known task shape.
+    """
+    key = plan_key(query, fingerprint)
+    plan = load_plan(key, plan_dir)
+    if plan is not None:
+        return plan, "cache"
+    plan = compile_plan(query)
+    if plan is None:
+        return None, None
+    save_plan(key, query, plan, plan_dir)
+    return plan, "compiled"
@@ -0,0 +1,211 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+
+class _Slot:
+    """One server process and its session, owned by a dedicated worker task"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.session = None
+        self.read = None
+        self.retired = False
+        self.uses = 0
+        self.last_used = 0.0
+        self.error = None
+        self.ready = asyncio.Event()
+        self.retire = asyncio.Event()
+        self.task = None
+
+
+class SessionPool:
+    """
+    Keeps size warm MCP sessions and hands them to episodes.
+    server is either StdioServerParameters, in which case each session talks to its
+    own server process, or the URL of a network server that all sessions share: its
+    SSE endpoint (a path ending in /sse) or its streamable-HTTP endpoint (anything else).
+    An episode holds a session exclusively while it runs; with stdio that also gives
+    it its own Paint canvas, which is per-process state.
+
+    Every session is opened and closed by its own worker task (the transports
+    must be closed by the task that opened them). A session idle for
+    longer than health_interval is pinged before it is handed out, and a session
+    that fails the ping or has served max_uses episodes is recycled: a replacement
+    process is started right away and the old one shuts down in the background.
+    A session whose transport has closed (its server died) or whose borrower raised is
+    recycled when it is returned, and a worker whose session ends with an error is replaced.
+    """
+
+    def __init__(self, server_params: StdioServerParameters | str, size: int = 1, max_uses: int = None,
+                 health_interval: float = 30.0, ping_timeout: float = 5.0, start_timeout: float = 60.0):
+        self.server_params = server_params
+        self.size = size
+        self.max_uses = max_uses
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.start_timeout = start_timeout
+        self._slots = set()
+        self._next_index = 0
+        self._idle = asyncio.Queue()
+        self._started = False
+        self._closing = False
+        self.starts = 0
+        self.start_failures = 0
+        self.recycles = 0
+        self.health_failures = 0
+        self.acquired = 0
+        self.acquire_wait = 0.0
+
+    def _connect(self):
+        if isinstance(self.server_params, str):
+            if urlparse(self.server_params).path.rstrip("/").endswith("/sse"):
+                return sse_client(self.server_params)
+            return streamablehttp_client(self.server_params)
+        return stdio_client(self.server_params)
+
+    def _spawn(self, delay: float = 0.0) -> _Slot:
+        slot = _Slot(self._next_index)
+        self._next_index += 1
+        self._slots.add(slot)
+        slot.task = asyncio.create_task(self._run_slot(slot, delay), name=f"mcp-session-{slot.index}")
+        return slot
+
+    async def _run_slot(self, slot: _Slot, delay: float = 0.0):
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            async with self._connect() as streams:
+                read, write = streams[0], streams[1]
+                slot.read = read
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    slot.session = session
+                    slot.last_used = time.monotonic()
+                    self.starts += 1
+                    self._idle.put_nowait(slot)
+                    slot.ready.set()
+                    await slot.retire.wait()
+        except Exception as e:
+            slot.error = e
+            if slot.session is None:
+                self.start_failures += 1
+                # Replacements keep retrying; a failure during start() is reported by start()
+                if self._started and not self._closing:
+                    self._spawn(delay=1.0)
+            elif not slot.retired and not self._closing:
+                # Died while serving: keep the pool at size
+                self.recycles += 1
+                slot.retired = True
+                self._spawn()
+        finally:
+            slot.session = None
+            slot.ready.set()
+            self._slots.discard(slot)
+
+    async def start(self):
+        initial = [self._spawn() for _ in range(self.size)]
+        # Start all server processes in parallel
+        await asyncio.wait_for(asyncio.gather(*(slot.ready.wait() for slot in initial)), self.start_timeout)
+        failed = [slot for slot in initial if slot.session is None]
+        if failed:
+            error = failed[0].error
+            await self.close()
+            raise RuntimeError(f"{len(failed)} of {self.size} MCP server sessions failed to start: {error}")
+        self._started = True
+        return self
+
+    async def close(self):
+        self._closing = True
+        slots = list(self._slots)
+        for slot in slots:
+            slot.retire.set()
+        await asyncio.gather(*(slot.task for slot in slots), return_exceptions=True)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _recycle(self, slot: _Slot) -> None:
+        self.recycles += 1
+        slot.retired = True
+        slot.retire.set()
+        if not self._closing:
+            self._spawn()
+
+    @staticmethod
+    def _alive(slot: _Slot) -> bool:
+        """False once the worker has ended or the server side of the transport has closed"""
+        if slot.session is None or slot.task.done():
+            return False
+        return slot.read is None or slot.read.statistics().open_send_streams > 0
+
+    async def _healthy(self, slot: _Slot) -> bool:
+        if not self._alive(slot):
+            self.health_failures += 1
+            return False
+        if time.monotonic() - slot.last_used < self.health_interval:
+            return True
+        try:
+            await asyncio.wait_for(slot.session.send_ping(), self.ping_timeout)
+            return True
+        except Exception:
+            self.health_failures += 1
+            return False
+
+    async def _acquire(self) -> _Slot:
+        while True:
+            slot = await self._idle.get()
+            # Skip processes that died or were recycled while queued
+            if slot.retired or slot.session is None:
+                continue
+            if await self._healthy(slot):
+                return slot
+            self._recycle(slot)
+
+    @asynccontextmanager
+    async def session(self):
+        """Borrow a warm session, waiting if all of them are in use"""
+        waited = time.perf_counter()
+        slot = await self._acquire()
+        self.acquired += 1
+        self.acquire_wait += time.perf_counter() - waited
+        failed = False
+        try:
+            yield slot.session
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            slot.uses += 1
+            slot.last_used = time.monotonic()
+            if slot.retired or self._closing:
+                pass
+            elif failed or not self._alive(slot):
+                # The borrower hit an error (possibly the transport's) or the server died meanwhile
+                self.health_failures += 1
+                self._recycle(slot)
+            elif self.max_uses and slot.uses >= self.max_uses:
+                self._recycle(slot)
+            else:
+                self._idle.put_nowait(slot)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "starts": self.starts,
+            "start_failures": self.start_failures,
+            "recycles": self.recycles,
+            "health_failures": self.health_failures,
+            "acquired": self.acquired,
+            "avg_acquire_wait_ms": round(1000 * self.acquire_wait / self.acquired, 3) if self.acquired else 0.0,
+        }
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+
+def importtime_breakdown(module_name: str, top: int = 15, cwd: str = None) -> list[tuple[int, int, str]]:
+    """
+    Import module_name in a fresh interpreter under -X importtime and return the
+    top slowest imports as (self_us, cumulative_us, module) sorted by cumulative time.
+    """
+    code = f"import importlib; importlib.import_module({module_name!r})"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=cwd)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows[:top]
+
+
+def format_startup_report(phases: list[tuple[str, float]], module_file: str, top: int = 15) -> str:
+    """Phase timings of this process plus an importtime table from a fresh one"""
+    lines = ["Startup phases (this process):"]
+    for (name, at), (_, previous) in zip(phases[1:], phases):
+        lines.append(f"  {name:<24} {1000 * (at - previous):9.1f} ms")
+    lines.append(f"  {'total':<24} {1000 * (phases[-1][1] - phases[0][1]):9.1f} ms")
+
+    module_dir, module_name = os.path.split(os.path.abspath(module_file))
+    lines.append(f"\nSlowest imports of {module_name} (-X importtime, fresh interpreter):")
+    lines.append(f"  {'self ms':>9} {'cumul. ms':>10}  module")
+    for self_us, cumulative_us, name in importtime_breakdown(os.path.splitext(module_name)[0], top, module_dir):
+        lines.append(f"  {self_us / 1000:9.1f} {cumulative_us / 1000:10.1f}  {name}")
+    return "\n".join(lines)
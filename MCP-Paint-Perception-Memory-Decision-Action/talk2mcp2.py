@@ -1,151 +1,104 @@
 import os
 from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters, types
-from mcp.client.stdio import stdio_client
+from mcp import StdioServerParameters, types
 import asyncio
-import google.generativeai as genai
+import argparse
 from concurrent.futures import TimeoutError
 from functools import partial
 import json
-import ast
+import logging
+import time
+from async_logging import setup_logging
+from call_parser import CallParser, split_params
+from conversation import Conversation
+from dispatch import ToolCall, check_graph, dispatch_calls, parse_function_calls
+from episode_log import EpisodeRecorder, compare_tool_timings, load_events
+from llm import PROVIDERS, get_llm_executor, make_provider
+from memory import AgentMemory
+from planner import get_plan, plan_from_dicts, plan_to_dicts
+from session_pool import SessionPool
+from tracing import configure as configure_tracing, get_tracer, trace_meta
+from tool_cache import (load_tool_catalogue, prime_session, render_tools_description, save_tool_catalogue,
+                        server_fingerprint)
+
+logger = logging.getLogger("agent")
+
+
+# Load environment variables from .env file (GEMINI_API_KEY, LLM_PROVIDER, ...)
+load_dotenv()
 
-def parse_function_call_params(param_parts: list[str]) -> dict:
-    """
-    Parses key=value parts from the FUNCTION_CALL format.
-    Supports nested keys like input.string=foo and list values like input.int_list=[1,2,3]
-    Returns a nested dictionary.
-    """
-    result = {}
+max_iterations = 11
 
-    for part in param_parts:
-        if "=" not in part:
-            raise ValueError(f"Invalid parameter format (expected key=value): {part}")
+QUERY = """First open Paint. Then draw a rectangle from (780, 380) to (1140, 700), by selecting the rectangle button at the coordinate(640, 109). Finally, calculate the sum of the exponentials of the ASCII values of the word Dhanush and add this sum as text inside the rectangle."""
 
-        key, value = part.split("=", 1)
 
-        # Try to parse as Python literal (int, float, list, etc.)
-        try:
-            parsed_value = ast.literal_eval(value)
-        except Exception:
-            parsed_value = value.strip()
+# Output protocol of the prompt: FUNCTION_CALL text lines, or native function calling
+TEXT_PROTOCOL = """===============================
+🔨 TOOL EXECUTION RULES  
+- Use only one FUNCTION_CALL per step; each FUNCTION_CALL line is one step  
+- Steps that do not need each other's results may be sent together, one FUNCTION_CALL per line; they run at the same time
+- To use the result of a call sent in the same turn, name it `id=tool_name` and pass `$id` (or `$id.field` for one output field)
+- Never repeat a tool with the same parameters  
+- Use results from prior steps as inputs  
+- Always wrap the value passed to `add_text_in_paint.text` in quotes (as a string), even if it is a number or scientific notation.
+- When several shapes or texts can be drawn with values you already know, send them together in one `draw_batch` call.
+- If a tool fails, retry once. If it still fails, use:  
+  `ERROR_HALT: [reason]`
 
-        # Support nested keys like input.string
-        keys = key.split(".")
-        current = result
-        for k in keys[:-1]:
-            current = current.setdefault(k, {})
-        current[keys[-1]] = parsed_value
+===============================
+✅ OUTPUT FORMAT  
+Respond with one or more FUNCTION_CALL lines, or exactly one FINAL_ANSWER or ERROR_HALT line:
+1. FUNCTION_CALL: tool_name|param1=value1|param2=value2
+2. FINAL_ANSWER: [result]
+3. ERROR_HALT: [reason]
 
-    return result
+📝 Examples:
+- FUNCTION_CALL: open_paint  
+- FUNCTION_CALL: draw_rectangle|x1=780|y1=380|x2=1140|y2=700  
+- FUNCTION_CALL: strings_to_chars_to_int|input.string=Dhanush  
+- FUNCTION_CALL: int_list_to_exponential_sum|input.int_list=[68,104,...]  
+- FUNCTION_CALL: add_text_in_paint|text="12345.67"  
+- FUNCTION_CALL: draw_batch|commands=["rect 780 380 1140 700","text 800 400 12345.67"]  
+- FINAL_ANSWER: [12345.67]
+- Several calls in one turn:
+  FUNCTION_CALL: draw_rectangle|x1=780|y1=380|x2=1140|y2=700
+  FUNCTION_CALL: ascii=strings_to_chars_to_int|input.string=Dhanush
+  FUNCTION_CALL: int_list_to_exponential_sum|input.int_list=$ascii.ascii_values
 
-# Load environment variables from .env file
-load_dotenv()
+"""
 
-# Access your API key and initialize Gemini client correctly
-api_key = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=api_key)
+TEXT_CLOSING = """DO NOT include any explanations or extra text.
+Only output lines starting with FUNCTION_CALL, or a single line starting with FINAL_ANSWER or ERROR_HALT.
+"""
 
-max_iterations = 11
-last_response = None
-iteration = 0
-iteration_response = []
+NATIVE_PROTOCOL = """===============================
+🔨 TOOL EXECUTION RULES  
+- Call the tools through function calling; each function call is one step  
+- Steps that do not need each other's results may be called together; they run at the same time
+- Never repeat a tool with the same parameters  
+- Use results from prior steps as inputs  
+- Always pass `add_text_in_paint.text` as a string, even if it is a number or scientific notation.
+- When several shapes or texts can be drawn with values you already know, send them together in one `draw_batch` call.
+- If a tool fails, retry once. If it still fails, reply with the text:  
+  `ERROR_HALT: [reason]`
 
-async def generate_with_timeout(model, prompt, timeout=10):
-    """Generate content with a timeout"""
-    print("Starting LLM generation...")
-    try:
-        # Convert the synchronous generate_content call to run in a thread
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(
-                None, 
-                lambda: model.generate_content(prompt)
-            ),
-            timeout=timeout
-        )
-        print("LLM generation completed")
-        return response
-    except TimeoutError:
-        print("LLM generation timed out!")
-        raise
-    except Exception as e:
-        print(f"Error in LLM generation: {e}")
-        raise
+===============================
+✅ OUTPUT FORMAT  
+Respond with one or more function calls, or with exactly one text line when the task is done or impossible:
+1. FINAL_ANSWER: [result]
+2. ERROR_HALT: [reason]
 
-def reset_state():
-    """Reset all global variables to their initial state"""
-    global last_response, iteration, iteration_response
-    last_response = None
-    iteration = 0
-    iteration_response = []
-
-async def main():
-    reset_state()  # Reset at the start of main
-    print("Starting main execution...")
-    
-    # Create a fresh Gemini model
-    model = genai.GenerativeModel(model_name="gemini-2.0-flash")
-    
-    try:
-        # Create a single MCP server connection
-        print("Establishing connection to MCP server...")
-        server_params = StdioServerParameters(
-            command="python",
-            args=["example2-4.py"]
-        )
+"""
+
+NATIVE_CLOSING = """DO NOT include any explanations or extra text.
+Only make function calls, or reply with a single line starting with FINAL_ANSWER or ERROR_HALT.
+"""
 
-        async with stdio_client(server_params) as (read, write):
-            print("Connection established, creating session...")
-            async with ClientSession(read, write) as session:
-                print("Session created, initializing...")
-                await session.initialize()
-                
-                # Get available tools
-                print("Requesting tool list...")
-                tools_result = await session.list_tools()
-                tools = tools_result.tools
-                print(f"Successfully retrieved {len(tools)} tools")
-
-                # Create system prompt with available tools
-                print("Creating system prompt...")
-                print(f"Number of tools: {len(tools)}")
-                
-                try:
-                    tools_description = []
-                    for i, tool in enumerate(tools):
-                        try:
-                            # Get tool properties
-                            params = tool.inputSchema
-                            desc = getattr(tool, 'description', 'No description available')
-                            name = getattr(tool, 'name', f'tool_{i}')
-                            
-                            # Format the input schema in a more readable way
-                            if 'properties' in params:
-                                param_details = []
-                                for param_name, param_info in params['properties'].items():
-                                    param_type = param_info.get('type', 'unknown')
-                                    param_details.append(f"{param_name}: {param_type}")
-                                params_str = ', '.join(param_details)
-                            else:
-                                params_str = 'no parameters'
-
-                            tool_desc = f"{i+1}. {name}({params_str}) - {desc}"
-                            tools_description.append(tool_desc)
-                            print(f"Added description for tool: {tool_desc}")
-                        except Exception as e:
-                            print(f"Error processing tool {i}: {e}")
-                            tools_description.append(f"{i+1}. Error processing tool")
-                    
-                    tools_description = "\n".join(tools_description)
-                    print("Successfully created tools description")
-                except Exception as e:
-                    print(f"Error creating tools description: {e}")
-                    tools_description = "Error loading tools"
-                
-                print("Created system prompt...")
-                user_preference = input("Before we begin, please tell me something about your preferences (e.g., your location, tastes, favorite styles): ")
 
-                system_prompt = f"""
+def build_system_prompt(user_preference: str, native_tools: bool = False) -> str:
+    """The agent prompt; with native_tools the model calls tools through function calling instead of FUNCTION_CALL lines"""
+    protocol, closing = (NATIVE_PROTOCOL, NATIVE_CLOSING) if native_tools else (TEXT_PROTOCOL, TEXT_CLOSING)
+    return f"""
 You are an intelligent agent that must complete a multi-step task using available tools. You are equipped with reasoning, memory, and action capabilities.
 
 👤 USER PREFERENCE (important): {user_preference}
@@ -166,31 +119,7 @@ The task must be done step-by-step. Each step uses a different tool. Do not skip
 - Internally verify output correctness before moving forward
 - If unsure, ask yourself: "Do I have the right output to proceed?"
 
-===============================
-🔨 TOOL EXECUTION RULES  
-- Use only one FUNCTION_CALL per step  
-- Never repeat a tool with the same parameters  
-- Use results from prior steps as inputs  
-- Always wrap the value passed to `add_text_in_paint.text` in quotes (as a string), even if it is a number or scientific notation.
-- If a tool fails, retry once. If it still fails, use:  
-  `ERROR_HALT: [reason]`
-
-===============================
-✅ OUTPUT FORMAT  
-Respond with exactly one line:
-1. FUNCTION_CALL: tool_name|param1=value1|param2=value2
-2. FINAL_ANSWER: [result]
-3. ERROR_HALT: [reason]
-
-📝 Examples:
-- FUNCTION_CALL: open_paint  
-- FUNCTION_CALL: draw_rectangle|x1=780|y1=380|x2=1140|y2=700  
-- FUNCTION_CALL: strings_to_chars_to_int|input.string=Dhanush  
-- FUNCTION_CALL: int_list_to_exponential_sum|input.int_list=[68,104,...]  
-- FUNCTION_CALL: add_text_in_paint|text="12345.67"  
-- FINAL_ANSWER: [12345.67]
-
-===============================
+{protocol}===============================
 🔁 SELF-CHECK & VALIDATION  
 - After each tool call, internally verify: did it succeed?
 - Is the output empty? Retry or halt.
@@ -203,189 +132,567 @@ Examples:
 - Stylize or localize behavior if relevant
 - Adjust how you represent the text or interaction (e.g., regional text format)
 
-DO NOT include any explanations or extra text.
-Only output a single line starting with FUNCTION_CALL, FINAL_ANSWER, or ERROR_HALT.
-"""
+{closing}"""
+
+
+def log_info(message, *args, level=logging.INFO):
+    logger.log(level, message, *args)
+
+
+async def generate_with_timeout(llm, prompt, timeout=10, executor=None, log=log_info):
+    """Generate content with a timeout"""
+    log("Starting LLM generation...", level=logging.DEBUG)
+    try:
+        executor = executor or get_llm_executor()
+        if hasattr(llm, "generate_async"):
+            # Native async client: bounded by the same pool size, nothing is left running on timeout
+            response = await executor.run_async(lambda: llm.generate_async(prompt), timeout=timeout)
+        else:
+            # Run the synchronous generate call on the dedicated LLM thread pool
+            response = await executor.run(lambda: llm.generate(prompt), timeout=timeout)
+        log("LLM generation completed", level=logging.DEBUG)
+        return response
+    except TimeoutError:
+        log("LLM generation timed out!", level=logging.ERROR)
+        raise
+    except Exception as e:
+        log("Error in LLM generation: %s", e, level=logging.ERROR)
+        raise
+
+
+async def load_tools(session):
+    """Tool list and rendered description, reusing the cached catalogue while the server files are unchanged"""
+    fingerprint = server_fingerprint()
+    cached = load_tool_catalogue(fingerprint)
+    if cached:
+        tools, tools_description = cached
+        logger.info("Loaded %d tools from cache", len(tools))
+        return tools, tools_description
+
+    logger.info("Requesting tool list...")
+    tools_result = await session.list_tools()
+    tools = tools_result.tools
+    logger.info("Successfully retrieved %d tools", len(tools))
+
+    # Create system prompt with available tools
+    logger.debug("Creating system prompt...")
+    logger.debug("Number of tools: %d", len(tools))
+
+    try:
+        tools_description = render_tools_description(tools)
+        logger.debug("Successfully created tools description")
+        save_tool_catalogue(fingerprint, tools, tools_description)
+    except Exception as e:
+        logger.error("Error creating tools description: %s", e)
+        tools_description = "Error loading tools"
+    return tools, tools_description
 
 
-                query = """First open Paint. Then draw a rectangle from (780, 380) to (1140, 700), by selecting the rectangle button at the coordinate(640, 109). Finally, calculate the sum of the exponentials of the ASCII values of the word Dhanush and add this sum as text inside the rectangle."""
-                
-                print("Starting iteration loop...")
-                
-                # Use global iteration variables
-                global iteration, last_response
-                
-                # Track progress
-                steps_completed = {
-                    'paint_opened': False,
-                    'rectangle_drawn': False,
-                    'ascii_calculated': False,
-                    'exponential_calculated': False,
-                    'text_added': False
-                }
-                
-                # Track the last successful tool call
-                last_successful_tool = None
-                
-                while iteration < max_iterations:
-                    print(f"\n--- Iteration {iteration + 1} ---")
-                    
-                    # Improved progress summary
-                    progress_summary = (
-                        "Steps completed so far:\n"
-                        f"1. Paint opened: {steps_completed['paint_opened']}\n"
-                        f"2. Rectangle drawn: {steps_completed['rectangle_drawn']}\n"
-                        f"3. ASCII calculated: {steps_completed['ascii_calculated']}\n"
-                        f"4. Exponential calculated: {steps_completed['exponential_calculated']}\n"
-                        f"5. Text added: {steps_completed['text_added']}\n"
-                    )
-                    previous_results = "\n".join(iteration_response)
-
-                    # Add a hint if the last tool was repeated
-                    repeat_hint = ""
-                    if last_successful_tool:
-                        repeat_hint = f"\nYou have already called {last_successful_tool}. Do not call it again. Move to the next step."
-
-                    if last_response is None:
-                        current_query = (
-                            f"{query}\n\nStart with the first step."
-                        )
+class Episode:
+    """
+    One run of the agent loop. All per-run state (iteration counter, memory,
+    conversation, last response) lives here, so many episodes can run side by side.
+    """
+
+    def __init__(self, llm, system_prompt, query=QUERY, recorder=None, episode_id=None, verbose=True, plan=None,
+                 call_parser=None):
+        self.llm = llm
+        self.query = query
+        # Compiled tool-call DAG for a recognized query, run before (and instead of) the LLM loop
+        self.plan = plan
+        # Schema-typed FUNCTION_CALL parsing, compiled from the tool list when not shared by the caller
+        self.call_parser = call_parser
+        self.recorder = recorder or EpisodeRecorder()
+        self.episode_id = episode_id
+        self.verbose = verbose
+        self.iteration = 0
+        self.last_response = None
+        # Track the last successful tool call
+        self.last_successful_tool = None
+        # Progress is tracked in memory.steps
+        self.memory = AgentMemory()
+        # Older exchanges fall out of the window, memory carries their summaries
+        self.conversation = Conversation(system_prompt, max_turns=4, on_drop=self._turn_dropped)
+        self.completed = False
+        self.elapsed = 0.0
+
+    def _turn_dropped(self, role: str, text: str) -> None:
+        if role == "user":
+            self.memory.turn_dropped()
+
+    def log(self, message: str, *args, level=logging.INFO) -> None:
+        # Quiet episodes (several running at once) still report warnings and errors
+        if self.verbose or level >= logging.WARNING:
+            if self.episode_id is not None:
+                message = f"[episode {self.episode_id}] {message}"
+            logger.log(level, message, *args)
+
+    def debug(self, message: str, *args) -> None:
+        """Lazily formatted: the arguments are only rendered when DEBUG is enabled"""
+        self.log(message, *args, level=logging.DEBUG)
+
+    async def run(self, session, tools):
+        started = time.perf_counter()
+        if self.call_parser is None:
+            self.call_parser = CallParser(tools)
+        # Sessions from the pool never listed the tools themselves
+        prime_session(session, tools)
+        try:
+            with get_tracer().span("episode", episode_id=self.episode_id,
+                                   provider=self.llm.name if self.llm else None) as span:
+                if not (self.plan and await self._run_plan(session, tools)):
+                    if self.llm is None:
+                        self.log("No LLM turns to fall back to, stopping", level=logging.WARNING)
                     else:
-                        # Encourage step-by-step execution based on current progress
-                        current_query = (
-                            f"Current progress:\n{progress_summary}\n"
-                            f"Recent tool outputs:\n{previous_results}\n"
-                            f"{repeat_hint}\n\n"
-                            "What should I do next to complete the task?"
+                        await self._loop(session, tools)
+                span.set(completed=self.completed, iterations=self.iteration)
+        finally:
+            self.elapsed = time.perf_counter() - started
+        return self
+
+    async def _loop(self, session, tools):
+        memory = self.memory
+        log = self.log
+        tracer = get_tracer()
+
+        log("Starting iteration loop...")
+
+        while self.iteration < max_iterations:
+            with tracer.span("iteration", iteration=self.iteration + 1):
+                stop = await self._step(session, tools)
+            if stop:
+                break
+            self.iteration += 1
+
+        if self.iteration >= max_iterations:
+            log("=== MAX ITERATIONS REACHED ===", level=logging.WARNING)
+            log("Final steps completed: %s", memory.steps.steps_completed)
+
+    async def _step(self, session, tools) -> bool:
+        """One iteration: ask the model, then run the call(s) it chose. True ends the episode"""
+        memory = self.memory
+        conversation = self.conversation
+        recorder = self.recorder
+        log = self.log
+        tracer = get_tracer()
+
+        iteration = self.iteration
+        log("--- Iteration %d ---", iteration + 1)
+
+        # Improved progress summary
+        progress_summary = memory.steps.summary()
+        # Results the model has not seen, after summaries of those whose turns left the window;
+        # the turns still in the window carry the rest
+        task_turn = not conversation.turns
+        new_results = memory.history_for_turn(pinned=task_turn)
+
+        # Add a hint if the last tool was repeated
+        repeat_hint = ""
+        if self.last_successful_tool:
+            repeat_hint = f"\nYou have already called {self.last_successful_tool}. Do not call it again. Move to the next step."
+
+        if task_turn:
+            # The task turn; after a failed plan it also carries the plan's results
+            current_query = (
+                f"{self.query}\n\nCurrent progress:\n{progress_summary}\n{new_results}" if new_results
+                else f"{self.query}\n\nStart with the first step."
+            )
+        else:
+            # Encourage step-by-step execution based on current progress
+            current_query = (
+                f"Current progress:\n{progress_summary}\n"
+                f"{new_results}\n"
+                f"{repeat_hint}\n\n"
+                "What should I do next to complete the task?"
+            )
+
+        # Get model's response with timeout
+        self.debug("Preparing to generate LLM response...")
+        conversation.add_user(current_query)
+        contents, prompt_stats = conversation.next_request()
+        self.debug("Prompt bytes: prefix=%d history=%d delta=%d", prompt_stats["prefix_bytes"],
+                   prompt_stats["history_bytes"], prompt_stats["delta_bytes"])
+        try:
+            llm_started = time.perf_counter()
+            with tracer.span("llm_generate", provider=self.llm.name, **prompt_stats):
+                response = await generate_with_timeout(self.llm, contents, log=log)
+            self.debug("FULL LLM Response:\n%s", response.text)
+            response_text = response.text.strip()
+            # Structured calls in native function-calling mode, nothing to parse
+            native_calls = getattr(response, "function_calls", None) or []
+            if native_calls:
+                self.debug("Function calls: %s", native_calls)
+                conversation.add_model(response_text or "\n".join(
+                    f"Called {call.name} with {json.dumps(call.args)}" for call in native_calls))
+                recorder.llm(iteration + 1, current_query, response_text, time.perf_counter() - llm_started,
+                             function_calls=[call.to_dict() for call in native_calls], **prompt_stats)
+            else:
+                conversation.add_model(response_text)
+                recorder.llm(iteration + 1, current_query, response_text,
+                             time.perf_counter() - llm_started, **prompt_stats)
+
+            # Find the FUNCTION_CALL lines in the response
+            function_lines = [
+                line.strip() for line in response_text.split('\n')
+                if line.strip().startswith("FUNCTION_CALL:")
+            ]
+            if function_lines:
+                response_text = function_lines[0]
+        except Exception as e:
+            log("Failed to get LLM response: %s", e, level=logging.ERROR)
+            return True
+
+        if native_calls:
+            calls = [ToolCall(call.id or str(i), call.name, call.args) for i, call in enumerate(native_calls, 1)]
+            await self._execute_calls(session, tools, calls)
+
+        elif len(function_lines) > 1:
+            # Several calls in one turn, dispatched along their dependency graph
+            await self._dispatch_many(session, tools, function_lines)
+
+        elif response_text.startswith("FUNCTION_CALL:"):
+            _, function_info = response_text.split(":", 1)
+            parts = split_params(function_info)
+            func_name, param_parts = parts[0], parts[1:]
+            if "=" in func_name:
+                # A named call (ascii=strings_to_chars_to_int); alone in its turn nothing can refer to the name
+                func_name = func_name.split("=", 1)[1].strip()
+
+            self.debug("Raw function info: %s", function_info)
+            self.debug("Split parts: %s", parts)
+            self.debug("Function name: %s", func_name)
+            self.debug("Raw parameters: %s", param_parts)
+
+            # Check if we're repeating the same tool call
+            # if func_name == self.last_successful_tool:
+            #     log(f"WARNING: Attempting to call {func_name} again. Skipping...")
+            #     memory.add(f"Skipped duplicate call to {func_name}")
+            #     self.iteration += 1
+            #     continue
+
+            arguments = None
+            tool_started = time.perf_counter()
+            try:
+                tool = next((t for t in tools if t.name == func_name), None)
+                if not tool:
+                    self.debug("Available tools: %s", [t.name for t in tools])
+                    raise ValueError(f"Unknown tool: {func_name}")
+
+                self.debug("Found tool: %s", tool.name)
+                self.debug("Tool schema: %s", tool.inputSchema)
+
+                # Handle tools with no parameters
+                if not param_parts:
+                    arguments = {}
+                else:
+                    with tracer.span("parse", calls=1):
+                        arguments = self.call_parser.parse_params(func_name, param_parts)
+
+                self.debug("Final arguments: %s", arguments)
+                self.debug("Calling tool %s", func_name)
+
+                if func_name == "add_text_in_paint" and "text" in arguments:
+                    arguments["text"] = str(arguments["text"])
+                tool_started = time.perf_counter()
+                result = await self._call_tool(session, func_name, arguments)
+                tool_elapsed = time.perf_counter() - tool_started
+                self.debug("Raw result: %s", result)
+
+                self._record_success(func_name, arguments, result, tool_elapsed)
+
+            except Exception as e:
+                log("Tool call %s failed: %s: %s", func_name, type(e).__name__, e, level=logging.WARNING)
+                if self.verbose:
+                    logger.debug("Traceback of the failed call", exc_info=True)
+                memory.add(f"Error in iteration {iteration + 1}: {str(e)}")
+                recorder.tool(iteration + 1, func_name, arguments,
+                              elapsed=time.perf_counter() - tool_started, error=str(e))
+                # Don't break on error, continue to next iteration
+
+        elif response_text.startswith("FINAL_ANSWER:"):
+            self.completed = True
+            log("=== Agent Execution Complete ===")
+            log("Final steps completed: %s", memory.steps.steps_completed)
+            return True
+        return False
+
+    async def _run_plan(self, session, tools) -> bool:
+        """Execute the compiled plan; on any failure the LLM loop picks up from the recorded progress"""
+        self.log("Executing compiled plan...")
+        with get_tracer().span("plan", calls=len(self.plan)) as span:
+            succeeded = await self._execute_calls(session, tools, self.plan)
+            span.set(succeeded=succeeded)
+        self.iteration += 1
+        if succeeded:
+            self.completed = True
+            self.log("=== Plan Execution Complete ===")
+            self.log("Final steps completed: %s", self.memory.steps.steps_completed)
+        else:
+            self.log("Compiled plan failed, falling back to the LLM loop", level=logging.WARNING)
+        return succeeded
+
+    async def _call_tool(self, session, name, arguments):
+        """Call a tool in its own span, passing the span to the server as the parent of its work"""
+        with get_tracer().span("call_tool", tool=name) as span:
+            return await session.call_tool(name, arguments=arguments, meta=trace_meta(span))
+
+    def _record_success(self, func_name, arguments, result, tool_elapsed):
+        """Log, record and remember one successful tool call"""
+        log = self.log
+        iteration = self.iteration
+
+        if hasattr(result, 'content'):
+            self.debug("Result has content attribute")
+            if isinstance(result.content, list):
+                iteration_result = [
+                    item.text if hasattr(item, 'text') else str(item)
+                    for item in result.content
+                ]
+            else:
+                iteration_result = str(result.content)
+        else:
+            self.debug("Result has no content attribute")
+            iteration_result = str(result)
+
+        self.debug("Final iteration result: %s", iteration_result)
+
+        result_str = f"[{', '.join(iteration_result)}]" if isinstance(iteration_result, list) else str(iteration_result)
+        self.recorder.tool(iteration + 1, func_name, arguments, result_str, tool_elapsed)
+
+        # Update progress tracking
+        self.memory.steps.record(func_name)
+
+        # ✅ Only now mark this tool as the last successful one
+        self.last_successful_tool = func_name
+
+        self.memory.add(
+            f"In the {iteration + 1} iteration you called {func_name} with {arguments} parameters, "
+            f"and the function returned {result_str}."
+        )
+        self.last_response = iteration_result
+
+    async def _dispatch_many(self, session, tools, function_lines):
+        """Run every call of a multi-call turn, independent calls concurrently"""
+        try:
+            with get_tracer().span("parse", calls=len(function_lines)):
+                calls = parse_function_calls("\n".join(function_lines), self.call_parser.parse_params)
+        except Exception as e:
+            self.log("Invalid multi-call turn: %s", e, level=logging.WARNING)
+            self.memory.add(f"Error in iteration {self.iteration + 1}: {str(e)}")
+            return
+        await self._execute_calls(session, tools, calls)
+
+    async def _execute_calls(self, session, tools, calls) -> bool:
+        """Dispatch a DAG of tool calls and record each outcome; True if every call succeeded"""
+        log = self.log
+        iteration = self.iteration
+        try:
+            tool_names = {t.name for t in tools}
+            unknown = [call.name for call in calls if call.name not in tool_names]
+            if unknown:
+                raise ValueError(f"Unknown tool: {', '.join(unknown)}")
+            check_graph(calls)
+        except Exception as e:
+            log("Invalid calls: %s", e, level=logging.WARNING)
+            self.memory.add(f"Error in iteration {iteration + 1}: {str(e)}")
+            return False
+
+        self.debug("Dispatching %d calls: %s", len(calls), calls)
+
+        async def call_tool(name, arguments):
+            if name == "add_text_in_paint" and "text" in arguments:
+                arguments["text"] = str(arguments["text"])
+            return await self._call_tool(session, name, arguments)
+
+        with get_tracer().span("dispatch", calls=len(calls)):
+            outcomes = await dispatch_calls(calls, call_tool)
+
+        # Record in the order the model wrote the calls
+        for call in calls:
+            arguments, result, error, elapsed = outcomes[call.id]
+            if error is None:
+                self._record_success(call.name, arguments, result, elapsed)
+            else:
+                log("Call %s=%s failed: %s", call.id, call.name, error, level=logging.WARNING)
+                self.memory.add(f"Error in iteration {iteration + 1}, call {call.id}={call.name}: {error}")
+                self.recorder.tool(iteration + 1, call.name, arguments, elapsed=elapsed, error=str(error))
+        return all(outcome[2] is None for outcome in outcomes.values())
+
+
+def record_path(record, episode_index, episodes):
+    """Log file for one episode; with several episodes each gets its own numbered file"""
+    if not record or episodes == 1:
+        return record
+    root, ext = os.path.splitext(record)
+    return f"{root}-{episode_index}{ext or '.jsonl'}"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def throughput_report(episodes, wall_seconds) -> str:
+    durations = [e.elapsed for e in episodes]
+    iterations = sum(e.iteration + (1 if e.completed else 0) for e in episodes)
+    completed = sum(1 for e in episodes if e.completed)
+    return (
+        f"Episodes: {len(episodes)} ({completed} completed) in {wall_seconds:.2f}s\n"
+        f"Throughput: {len(episodes) / wall_seconds:.2f} episodes/s, {iterations / wall_seconds:.1f} iterations/s\n"
+        f"Episode latency: p50={percentile(durations, 0.5):.3f}s p95={percentile(durations, 0.95):.3f}s "
+        f"max={max(durations):.3f}s"
     )
 
 
-                    # Get model's response with timeout
-                    print("Preparing to generate LLM response...")
-                    prompt = f"{system_prompt}\n\nQuery: {current_query}"
-                    try:
-                        response = await generate_with_timeout(model, prompt)
-                        # Print the full LLM response for debugging
-                        print(f"FULL LLM Response:\n{response.text}")
-                        response_text = response.text.strip()
-                        
-                        # Find the FUNCTION_CALL line in the response
-                        for line in response_text.split('\n'):
-                            line = line.strip()
-                            if line.strip().startswith("FUNCTION_CALL:"):
-                                response_text = line.strip()
-                                break
-                    except Exception as e:
-                        print(f"Failed to get LLM response: {e}")
-                        break
-
-                    if response_text.startswith("FUNCTION_CALL:"):
-                        _, function_info = response_text.split(":", 1)
-                        parts = [p.strip() for p in function_info.split("|")]
-                        func_name, param_parts = parts[0], parts[1:]
-
-                        print(f"\nDEBUG: Raw function info: {function_info}")
-                        print(f"DEBUG: Split parts: {parts}")
-                        print(f"DEBUG: Function name: {func_name}")
-                        print(f"DEBUG: Raw parameters: {param_parts}")
-
-                        # Check if we're repeating the same tool call
-                        # if func_name == last_successful_tool:
-                        #     print(f"WARNING: Attempting to call {func_name} again. Skipping...")
-                        #     iteration_response.append(f"Skipped duplicate call to {func_name}")
-                        #     iteration += 1
-                        #     continue
-
-                        try:
-                            tool = next((t for t in tools if t.name == func_name), None)
-                            if not tool:
-                                print(f"DEBUG: Available tools: {[t.name for t in tools]}")
-                                raise ValueError(f"Unknown tool: {func_name}")
-
-                            print(f"DEBUG: Found tool: {tool.name}")
-                            print(f"DEBUG: Tool schema: {tool.inputSchema}")
-
-                            # Handle tools with no parameters
-                            if not param_parts:
-                                arguments = {}
-                            else:
-                                arguments = parse_function_call_params(param_parts)
-                            
-                            print(f"DEBUG: Final arguments: {arguments}")
-                            print(f"DEBUG: Calling tool {func_name}")
-                            
-                            if func_name == "add_text_in_paint" and "text" in arguments:
-                                arguments["text"] = str(arguments["text"])
-                            result = await session.call_tool(func_name, arguments=arguments)
-                            print(f"DEBUG: Raw result: {result}")
-
-                            if hasattr(result, 'content'):
-                                print(f"DEBUG: Result has content attribute")
-                                if isinstance(result.content, list):
-                                    iteration_result = [
-                                        item.text if hasattr(item, 'text') else str(item)
-                                        for item in result.content
-                                    ]
-                                else:
-                                    iteration_result = str(result.content)
-                            else:
-                                print(f"DEBUG: Result has no content attribute")
-                                iteration_result = str(result)
-
-                            print(f"DEBUG: Final iteration result: {iteration_result}")
-
-                            result_str = f"[{', '.join(iteration_result)}]" if isinstance(iteration_result, list) else str(iteration_result)
-
-                            # Update progress tracking
-                            # Update steps_completed dictionary
-                            if func_name == "open_paint":
-                                steps_completed['paint_opened'] = True
-                            elif func_name == "draw_rectangle":
-                                steps_completed['rectangle_drawn'] = True
-                            elif func_name == "strings_to_chars_to_int":
-                                steps_completed['ascii_calculated'] = True
-                            elif func_name == "int_list_to_exponential_sum":
-                                steps_completed['exponential_calculated'] = True
-                            elif func_name == "add_text_in_paint":
-                                steps_completed['text_added'] = True
-
-                            # ✅ Only now mark this tool as the last successful one
-                            last_successful_tool = func_name
-
-
-                            iteration_response.append(
-                                f"In the {iteration + 1} iteration you called {func_name} with {arguments} parameters, "
-                                f"and the function returned {result_str}."
-                            )
-                            last_response = iteration_result
-
-                        except Exception as e:
-                            print(f"DEBUG: Error details: {str(e)}")
-                            print(f"DEBUG: Error type: {type(e)}")
-                            import traceback
-                            traceback.print_exc()
-                            iteration_response.append(f"Error in iteration {iteration + 1}: {str(e)}")
-                            # Don't break on error, continue to next iteration
-
-                    elif response_text.startswith("FINAL_ANSWER:"):
-                        print("\n=== Agent Execution Complete ===")
-                        print(f"Final steps completed: {steps_completed}")
-                        break
-
-                    iteration += 1
-
-                if iteration >= max_iterations:
-                    print("\n=== MAX ITERATIONS REACHED ===")
-                    print(f"Final steps completed: {steps_completed}")
+async def main(llm_name=None, transcript=None, preference=None, paint_backend=None, record=None, replay=None,
+               episodes=1, sessions=1, verbose=None, max_uses=None, server_url=None, use_plans=True,
+               trace=None, server_log=None, tool_calling="text"):
+    logger.info("Starting main execution...")
+    if trace:
+        configure_tracing(trace, "client")
+    if verbose is None:
+        verbose = episodes == 1
+
+    # Replay re-runs the recorded plan, if any, and serves the recorded LLM responses
+    replay_events = None
+    replay_plan = None
+    if replay:
+        replay_events = load_events(replay)
+        llm_name, transcript = "scripted", replay
+        recorded_plan = next((e for e in replay_events if e.get("type") == "plan"), None)
+        if recorded_plan:
+            replay_plan = plan_from_dicts(recorded_plan["calls"])
+        if not any(e.get("type") == "llm" for e in replay_events):
+            # A plan-only episode never called the LLM
+            llm_name = None
+        recorded = next((e for e in replay_events if e.get("type") == "episode"), {})
+        if preference is None:
+            preference = recorded.get("preference", "")
+        tool_calling = recorded.get("tool_calling", "text")
+    recorders = [EpisodeRecorder(record_path(record, i, episodes)) for i in range(episodes)]
+
+    try:
+        # Create the MCP server connections: one stdio server process per session,
+        # or sessions on a shared network server (streamable HTTP or SSE) when server_url is given
+        logger.info("Establishing connection to MCP server...")
+        if server_url:
+            server_params = server_url
+        else:
+            server_args = ["example2-4.py"]
+            if paint_backend:
+                server_args += ["--backend", paint_backend]
+            # The server logs at the client's level, to stderr (shown here) or its own file
+            server_args += ["--log-level", logging.getLevelName(logging.getLogger().getEffectiveLevel())]
+            if server_log:
+                server_args += ["--log-file", server_log]
+            if trace:
+                # Server spans go to the same file, joined to the client's by the traceparent in each request
+                server_args += ["--trace-file", trace]
+            server_params = StdioServerParameters(
+                command="python",
+                args=server_args
+            )
+
+        # Warm server processes, recycled after max_uses episodes or a failed health check
+        async with SessionPool(server_params, size=max(1, min(sessions, episodes)), max_uses=max_uses) as pool:
+            logger.info("Connection established, %d session(s) initialized", pool.size)
+
+            async with pool.session() as session:
+                tools, tools_description = await load_tools(session)
+
+            logger.debug("Created system prompt...")
+            if preference is not None:
+                user_preference = preference
+            else:
+                user_preference = input("Before we begin, please tell me something about your preferences (e.g., your location, tastes, favorite styles): ")
+            native_tools = tool_calling == "native"
+            system_prompt = build_system_prompt(user_preference, native_tools)
+
+            # Known task shapes skip the LLM; replays run what was recorded
+            plan = None
+            if replay_plan:
+                plan, plan_source = replay_plan, "replay"
+                logger.info("Replaying recorded plan with %d tool calls", len(plan))
+            elif use_plans and not replay:
+                plan, plan_source = get_plan(QUERY, server_fingerprint())
+                if plan:
+                    logger.info("Using compiled plan with %d tool calls (%s)", len(plan), plan_source)
+                else:
+                    logger.info("No compiled plan for this query, using the LLM loop")
+
+            # Argument coercion compiled once from the tool schemas, shared by every episode
+            call_parser = CallParser(tools)
+            runs = []
+            for i in range(episodes):
+                # Create a fresh model with the system prompt as its fixed prefix
+                model = make_provider(llm_name, system_prompt, transcript) if llm_name or not replay else None
+                if native_tools and model:
+                    model.use_tools(tools)
+                recorders[i].episode(query=QUERY, preference=user_preference, provider=model.name if model else None,
+                                     paint_backend=paint_backend, replay_of=replay, tool_calling=tool_calling)
+                if plan:
+                    recorders[i].plan(plan_source, plan_to_dicts(plan))
+                runs.append(Episode(model, system_prompt, recorder=recorders[i],
+                                    episode_id=i if episodes > 1 else None, verbose=verbose, plan=plan,
+                                    call_parser=call_parser))
+            logger.info("Using LLM provider: %s", runs[0].llm.name if runs[0].llm else "none (recorded plan only)")
+
+            async def run_one(episode):
+                async with pool.session() as session:
+                    return await episode.run(session, tools)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(run_one(episode) for episode in runs))
+            wall_seconds = time.perf_counter() - started
+
+            if episodes > 1:
+                print("\n=== Throughput ===")
+                print(throughput_report(runs, wall_seconds))
+                print(f"Session pool: {pool.stats()}")
 
     except Exception as e:
-        print(f"Error in main execution: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in main execution: %s", e)
     finally:
-        reset_state()  # Reset at the end of main
+        logger.info("LLM executor: %s", get_llm_executor().metrics())
+        for recorder in recorders:
+            recorder.close()
+        if replay_events is not None:
+            print("\n=== Replay tool timings ===")
+            print(compare_tool_timings(replay_events, recorders[0].events))
 
 if __name__ == "__main__":
-    asyncio.run(main())
-    
-    
+    parser = argparse.ArgumentParser(description="Paint agent driving the MCP tool server")
+    parser.add_argument("--llm", choices=PROVIDERS,
+                        help="LLM provider (default: $LLM_PROVIDER or gemini); rules and scripted run offline")
+    parser.add_argument("--transcript", help="JSONL transcript for the scripted provider")
+    parser.add_argument("--preference", help="user preference text, skips the interactive question")
+    parser.add_argument("--paint-backend", choices=["windows", "raster"],
+                        help="drawing backend passed to the tool server")
+    parser.add_argument("--record", help="append every prompt, response and tool call of this episode to a JSONL log")
+    parser.add_argument("--replay", help="re-run a recorded episode, serving LLM responses from its log")
+    parser.add_argument("--episodes", type=int, default=1, help="number of episodes to run concurrently")
+    parser.add_argument("--sessions", type=int, default=1, help="MCP server sessions shared by the episodes")
+    parser.add_argument("--verbose", action="store_true", default=None,
+                        help="log per-iteration progress even with several episodes")
+    parser.add_argument("--max-uses", type=int, help="recycle a server process after this many episodes")
+    parser.add_argument("--server-url",
+                        help="use a running tool server instead of stdio: its streamable-HTTP endpoint "
+                             "(e.g. http://127.0.0.1:8000/mcp) or its SSE endpoint (e.g. http://127.0.0.1:8000/sse)")
+    parser.add_argument("--no-plan", action="store_true",
+                        help="always use the LLM loop, even for queries with a compiled plan")
+    parser.add_argument("--trace", help="append client and server spans of every episode to this JSONL file")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "INFO"),
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"], type=str.upper,
+                        help="least severe messages to log (default: $LOG_LEVEL or INFO)")
+    parser.add_argument("--log-file", help="write the log to this file instead of stderr")
+    parser.add_argument("--debug-sample", type=int, default=1,
+                        help="keep only every Nth DEBUG message of each log statement")
+    parser.add_argument("--server-log", help="write the stdio tool server's log to this file instead of stderr")
+    parser.add_argument("--tool-calling", choices=["text", "native"], default=os.getenv("TOOL_CALLING", "text"),
+                        help="text: FUNCTION_CALL lines parsed from the reply; native: the tool schemas are declared "
+                             "to the provider and it returns structured calls (default: $TOOL_CALLING or text)")
+    args = parser.parse_args()
+    setup_logging(args.log_level, args.log_file, debug_sample=args.debug_sample)
+    asyncio.run(main(args.llm, args.transcript, args.preference, args.paint_backend, args.record, args.replay,
+                     args.episodes, args.sessions, args.verbose, args.max_uses, args.server_url,
+                     not args.no_plan, args.trace, args.server_log, args.tool_calling))
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+import pytest
+
+from call_parser import CallParser, compile_coercers, literal_value, parse_function_call_params, split_params
+
+
+def tool(name, schema):
+    return SimpleNamespace(name=name, inputSchema=schema)
+
+
+EXP_SUM = tool("int_list_to_exponential_sum", {
+    "type": "object",
+    "properties": {"input": {"$ref": "#/$defs/ExpSumInput"}},
+    "$defs": {"ExpSumInput": {"type": "object", "properties": {
+        "int_list": {"type": "array", "items": {"type": "integer"}}}}},
+})
+TEXT = tool("add_text_in_paint", {"type": "object", "properties": {"text": {"type": "string"}}})
+MIXED = tool("mixed", {"type": "object", "properties": {
+    "n": {"type": "integer"},
+    "x": {"type": "number"},
+    "flag": {"type": "boolean"},
+    "maybe": {"anyOf": [{"type": "integer"}, {"type": "null"}]},
+    "weights": {"type": "array", "items": {"type": "number"}},
+    "commands": {"type": "array", "items": {}},
+}})
+
+
+@pytest.mark.parametrize("line, parts", [
+    ("open_paint", ["open_paint"]),
+    (" draw | x1=1 | y1=2 ", ["draw", "x1=1", "y1=2"]),
+    ('add_text_in_paint|text="a|b"|extra="c"', ["add_text_in_paint", 'text="a|b"', 'extra="c"']),
+    ("t|text='it''s'|n=1", ["t", "text='it''s'", "n=1"]),
+    ('t|text="say \\"x|y\\""|n=1', ["t", 'text="say \\"x|y\\""', "n=1"]),
+    ('draw_batch|commands=["rect 1 2 3 4","text 5 6 a|b"]|n=2',
+     ["draw_batch", 'commands=["rect 1 2 3 4","text 5 6 a|b"]', "n=2"]),
+    ('t|commands=[["x|y"], "z"]', ["t", 'commands=[["x|y"], "z"]']),
+    ('t|text="open|quote', ["t", 'text="open|quote']),
+])
+def test_split_params(line, parts):
+    assert split_params(line) == parts
+
+
+def test_literal_value_falls_back_to_text():
+    assert literal_value("[1, 2]") == [1, 2]
+    assert literal_value("'x'") == "x"
+    assert literal_value(" Dhanush ") == "Dhanush"
+
+
+def test_generic_parser_nests_dotted_keys():
+    assert parse_function_call_params(["input.a=1", "input.b=[2, 3]", "c=x"]) == {
+        "input": {"a": 1, "b": [2, 3]}, "c": "x"}
+    with pytest.raises(ValueError, match="expected key=value"):
+        parse_function_call_params(["novalue"])
+
+
+def test_compile_coercers_flattens_refs_and_optionals():
+    coercers = compile_coercers(EXP_SUM.inputSchema)
+    assert list(coercers) == ["input.int_list"]
+    assert coercers["input.int_list"]("[68, 104,97]") == [68, 104, 97]
+    assert compile_coercers(MIXED.inputSchema)["maybe"]("7") == 7
+
+
+@pytest.mark.parametrize("part, expected", [
+    ("n=42", {"n": 42}),
+    ("n=$a.count", {"n": "$a.count"}),
+    ("x=1.5", {"x": 1.5}),
+    ("x=3", {"x": 3.0}),
+    ("flag=True", {"flag": True}),
+    ("flag=false", {"flag": False}),
+    ("weights=[1, 2.5]", {"weights": [1.0, 2.5]}),
+    ("weights=[]", {"weights": []}),
+    ("weights=$a.values", {"weights": "$a.values"}),
+    ('commands=["rect 1 2 3 4", {"op": "fill"}]', {"commands": ["rect 1 2 3 4", {"op": "fill"}]}),
+    ("unknown=[1]", {"unknown": [1]}),
+])
+def test_coercion_follows_the_schema(part, expected):
+    assert CallParser([MIXED]).parse_params("mixed", [part]) == expected
+
+
+@pytest.mark.parametrize("value, text", [
+    ('"7.377834757903779e+50"', "7.377834757903779e+50"),
+    ("12345.67", "12345.67"),
+    ("'single'", "single"),
+    ('"tab\\tescaped"', "tab\tescaped"),
+    ('"a|b"', "a|b"),
+])
+def test_string_parameters_stay_text(value, text):
+    assert CallParser([TEXT]).parse(f"add_text_in_paint|text={value}") == ("add_text_in_paint", {"text": text})
+
+
+def test_compiled_parser_matches_generic_parser():
+    parser = CallParser([EXP_SUM, TEXT])
+    for line in ["int_list_to_exponential_sum|input.int_list=[68, 104, 97]", 'add_text_in_paint|text="x"', "open_paint"]:
+        parts = split_params(line)
+        assert parser.parse(line) == (parts[0], parse_function_call_params(parts[1:]))
+
+
+def test_unknown_tool_uses_the_generic_parser():
+    assert CallParser([]).parse("other|a=1|b=[1, 2]") == ("other", {"a": 1, "b": [1, 2]})
+
+
+def test_missing_equals_is_rejected():
+    with pytest.raises(ValueError, match="expected key=value"):
+        CallParser([TEXT]).parse("add_text_in_paint|text")
@@ -0,0 +1,132 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from call_parser import parse_function_call_params
+from dispatch import ToolCall, check_graph, dispatch_calls, parse_function_calls, resolve_refs
+
+
+def parse_params(name, parts):
+    return parse_function_call_params(parts)
+
+
+def structured(value, is_error=False):
+    return SimpleNamespace(structuredContent=value, content=[], isError=is_error)
+
+
+def run(calls, tools):
+    """Dispatch calls against tools {name: fn(arguments) -> result}, recording the start order"""
+    started = []
+
+    async def call_tool(name, arguments):
+        started.append(name)
+        await asyncio.sleep(0)
+        return tools[name](arguments)
+
+    return asyncio.run(dispatch_calls(calls, call_tool)), started
+
+
+def test_parse_names_calls_and_numbers_the_rest():
+    calls = parse_function_calls(
+        "FUNCTION_CALL: open_paint\n"
+        "thinking...\n"
+        "FUNCTION_CALL: ascii=strings_to_chars_to_int|input.string=Dhanush\n"
+        "FUNCTION_CALL: int_list_to_exponential_sum|input.int_list=$ascii.ascii_values",
+        parse_params,
+    )
+    assert [(c.id, c.name) for c in calls] == [
+        ("1", "open_paint"), ("ascii", "strings_to_chars_to_int"), ("3", "int_list_to_exponential_sum")]
+    assert calls[1].arguments == {"input": {"string": "Dhanush"}}
+    assert calls[2].deps == {"ascii"}
+
+
+def test_parse_rejects_duplicate_ids():
+    with pytest.raises(ValueError, match="Duplicate call ids: a"):
+        parse_function_calls("FUNCTION_CALL: a=open_paint\nFUNCTION_CALL: a=open_paint", parse_params)
+
+
+def test_resolve_refs_paths_and_bare_result():
+    values = {"ascii": {"ascii_values": [68, 104]}, "sum": {"result": 7.5}}
+    assert resolve_refs({"x": "$ascii.ascii_values.1", "y": ["$sum"], "z": "$5 note"}, values) == {
+        "x": 104, "y": [7.5], "z": "$5 note"}
+
+
+def test_check_graph_rejects_unknown_refs_and_cycles():
+    with pytest.raises(ValueError, match="unknown call"):
+        check_graph([ToolCall("a", "t", {"v": "$missing"})])
+    with pytest.raises(ValueError, match="cycle"):
+        check_graph([ToolCall("a", "t", {"v": "$b"}), ToolCall("b", "t", {"v": "$a"})])
+    check_graph([ToolCall("a", "t", {}), ToolCall("b", "t", {"v": "$a"}, after={"a"})])
+
+
+def test_dependent_call_gets_the_resolved_value():
+    calls = [
+        ToolCall("ascii", "chars", {"s": "Hi"}),
+        ToolCall("sum", "total", {"values": "$ascii.values"}),
+    ]
+    outcomes, started = run(calls, {
+        "chars": lambda a: structured({"values": [ord(c) for c in a["s"]]}),
+        "total": lambda a: structured({"result": sum(a["values"])}),
+    })
+    assert started == ["chars", "total"]
+    assert outcomes["sum"][0] == {"values": [72, 105]}
+    assert outcomes["sum"][1].structuredContent == {"result": 177}
+    assert all(outcome[2] is None for outcome in outcomes.values())
+
+
+def test_text_results_are_parsed_as_json():
+    text = SimpleNamespace(structuredContent=None, content=[SimpleNamespace(text='{"n": 3}')], isError=False)
+    outcomes, _ = run([ToolCall("a", "t", {}), ToolCall("b", "u", {"n": "$a.n"})],
+                      {"t": lambda a: text, "u": lambda a: structured(a["n"])})
+    assert outcomes["b"][0] == {"n": 3}
+
+
+def test_independent_calls_start_together():
+    calls = [ToolCall("a", "slow", {}), ToolCall("b", "slow", {}), ToolCall("c", "slow", {"x": "$a"})]
+    _, started = run(calls, {"slow": lambda a: structured({"result": 1})})
+    assert started[:2] == ["slow", "slow"] and len(started) == 3
+
+
+def test_failure_propagates_to_dependents_only():
+    def boom(arguments):
+        raise RuntimeError("tool crashed")
+
+    calls = [
+        ToolCall("a", "boom", {}),
+        ToolCall("b", "ok", {"x": "$a"}),
+        ToolCall("c", "ok", {}, after={"b"}),
+        ToolCall("d", "ok", {}),
+    ]
+    outcomes, started = run(calls, {"boom": boom, "ok": lambda a: structured({"result": 1})})
+    assert str(outcomes["a"][2]) == "tool crashed"
+    assert "dependency a failed" in str(outcomes["b"][2])
+    assert "dependency b failed" in str(outcomes["c"][2])
+    assert outcomes["d"][2] is None
+    assert started.count("ok") == 1
+
+
+def test_error_result_counts_as_failure():
+    outcomes, _ = run([ToolCall("a", "t", {}), ToolCall("b", "t", {"x": "$a"})],
+                      {"t": lambda a: structured({"result": 0}, is_error=True)})
+    assert "t returned an error" in str(outcomes["a"][2])
+    assert "dependency a failed" in str(outcomes["b"][2])
+
+
+@pytest.mark.parametrize("ref", ["$a.values.first", "$a.values.5", "$a.missing", "$a.values.0.x"])
+def test_bad_reference_path_fails_that_call_only(ref):
+    calls = [ToolCall("a", "t", {}), ToolCall("b", "t", {"x": ref}), ToolCall("c", "t", {})]
+    outcomes, started = run(calls, {"t": lambda a: structured({"values": [1, 2]})})
+    assert isinstance(outcomes["b"][2], ValueError)
+    assert "cannot resolve reference in b" in str(outcomes["b"][2])
+    assert outcomes["a"][2] is None and outcomes["c"][2] is None
+    assert len(started) == 2
+
+
+def test_unexpected_error_becomes_the_outcome():
+    # A result whose text cannot even be read must not escape dispatch_calls
+    broken = SimpleNamespace(structuredContent=None, content=[SimpleNamespace(text=None)], isError=False)
+    calls = [ToolCall("a", "t", {}), ToolCall("b", "u", {"x": "$a"})]
+    outcomes, _ = run(calls, {"t": lambda a: broken, "u": lambda a: structured(1)})
+    assert outcomes["a"][2] is not None
+    assert "dependency a failed" in str(outcomes["b"][2])
@@ -0,0 +1,52 @@
+from conversation import Conversation
+from memory import AgentMemory
+
+
+def episode(steps, memory=None, max_turns=4):
+    """Run steps user/model exchanges, one tool result per step, as Episode._step does"""
+    memory = AgentMemory() if memory is None else memory
+    conversation = Conversation("system", max_turns=max_turns,
+                                on_drop=lambda role, text: role == "user" and memory.turn_dropped())
+    for i in range(steps):
+        conversation.add_user(f"u{i}\n" + memory.history_for_turn(pinned=not conversation.turns))
+        conversation.add_model(f"m{i}")
+        memory.add(f"result{i}")
+    return memory, conversation
+
+
+def test_each_result_is_sent_once_while_its_turn_is_in_the_window():
+    memory, conversation = episode(3)
+    texts = [text for _, text in conversation.turns]
+    assert texts == ["u0\n", "m0", "u1\nNew tool outputs:\nresult0", "m1", "u2\nNew tool outputs:\nresult1", "m2"]
+    assert memory.render() == ""
+
+
+def test_results_of_dropped_turns_come_back_as_summaries():
+    memory, conversation = episode(6)
+    texts = [text for _, text in conversation.turns]
+    assert [t.split("\n")[0] for t in texts] == ["u0", "m0", "u4", "m4", "u5", "m5"]
+    assert texts[4] == "u5\nEarlier tool outputs (summarized):\n- result0\n- result1\nNew tool outputs:\nresult4"
+    # result2 left with u3 after the last turn was sent, so the next turn carries it
+    assert memory.history_for_turn().splitlines()[1:4] == ["- result0", "- result1", "- result2"]
+
+
+def test_summaries_stay_within_the_token_budget():
+    memory, _ = episode(200, AgentMemory(token_budget=50))
+    rendered = memory.render()
+    assert len(rendered) <= 50 * 4
+    assert memory.dropped > 0 and "older omitted" in rendered
+    assert len(memory) == 200
+
+
+def test_pinned_turn_results_are_not_summarized_twice():
+    memory = AgentMemory()
+    memory.add("plan result")
+    conversation = Conversation("system", max_turns=2,
+                                on_drop=lambda role, text: role == "user" and memory.turn_dropped())
+    conversation.add_user(memory.history_for_turn(pinned=True))
+    conversation.add_model("m0")
+    for i in range(1, 4):
+        conversation.add_user(memory.history_for_turn())
+        conversation.add_model(f"m{i}")
+    assert "plan result" in conversation.turns[0][1]
+    assert "plan result" not in memory.render()
@@ -0,0 +1,82 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import ImageColor, ImageDraw
+
+from paint_backend import DrawCommand, PaintBackend, RasterPaintBackend, parse_draw_command
+
+
+@pytest.mark.parametrize("command, expected", [
+    ("rect 780 380 1140 700", DrawCommand("rect", (780, 380, 1140, 700))),
+    ("fill 10 20", DrawCommand("fill", (10, 20))),
+    ("text 800 400 7.37e+50 and more", DrawCommand("text", (800, 400), "7.37e+50 and more")),
+    ({"op": "ellipse", "x1": 1, "y1": 2, "x2": 3, "y2": 4}, DrawCommand("ellipse", (1, 2, 3, 4))),
+])
+def test_parse_draw_command(command, expected):
+    assert parse_draw_command(command, (1920, 1080)) == expected
+
+
+@pytest.mark.parametrize("command, message", [
+    ("blur 1 2", "Unknown draw op"),
+    ("rect 1 2 3", "needs 4 coordinates"),
+    ("fill 1 2 3", "Too many values"),
+    ({"op": "fill", "x": 1}, "missing y"),
+    ("fill 5000 5000", "outside the 1920x1080 canvas"),
+    ("line -1 0 10 10", "outside"),
+    ("rect 0 0 1920 10", "outside"),
+])
+def test_parse_draw_command_rejects(command, message):
+    with pytest.raises(ValueError, match=message):
+        parse_draw_command(command, (1920, 1080))
+
+
+def test_coordinates_are_unchecked_without_a_size():
+    assert parse_draw_command("fill 5000 5000").coords == (5000, 5000)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fill_matches_pillow_floodfill(seed):
+    rng = random.Random(seed)
+    backend = RasterPaintBackend(size=(200, 120))
+    backend.open()
+    for _ in range(12):
+        x, y = rng.randrange(190), rng.randrange(110)
+        draw = rng.choice([backend.draw_rectangle, backend.draw_ellipse, backend.draw_line])
+        draw(x, y, x + rng.randrange(60), y + rng.randrange(60))
+    expected = backend.image.copy()
+    seed_point = (rng.randrange(200), rng.randrange(120))
+    ImageDraw.floodfill(expected, seed_point, ImageColor.getrgb(backend.outline))
+    backend.fill(*seed_point)
+    assert np.array_equal(np.asarray(backend.image), np.asarray(expected))
+
+
+def test_fill_outside_the_canvas_is_an_error():
+    backend = RasterPaintBackend(size=(50, 50))
+    backend.open()
+    with pytest.raises(ValueError, match="outside"):
+        backend.fill(50, 10)
+
+
+def test_incomplete_backend_fails_at_creation():
+    class NoFill(PaintBackend):
+        def is_open(self):
+            return True
+
+        def open(self):
+            return "open"
+
+        def draw_rectangle(self, x1, y1, x2, y2):
+            pass
+
+        def add_text(self, text, position=None):
+            pass
+
+        def draw_line(self, x1, y1, x2, y2):
+            pass
+
+        def draw_ellipse(self, x1, y1, x2, y2):
+            pass
+
+    with pytest.raises(TypeError, match="fill"):
+        NoFill()
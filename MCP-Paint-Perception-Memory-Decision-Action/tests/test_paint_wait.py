@@ -0,0 +1,179 @@
+import time
+
+import pytest
+
+from paint_backend import FILL_TOOL, RECTANGLE_TOOL, DrawCommand, WindowsPaintBackend
+from paint_wait import CHANGE_TIMEOUT, MAX_INTERVAL, wait_for_canvas_change, wait_until
+
+
+class FakeClock:
+    """Virtual time: sleeping advances it instantly"""
+
+    def __init__(self):
+        self.t = 0.0
+        self.sleeps = []
+
+    def now(self):
+        return self.t
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.t += seconds
+
+
+class FakeCanvas:
+    """Records input; a drag shows on the canvas a few polls after its release, like a busy UI"""
+
+    def __init__(self, events, lag_polls=3):
+        self.events = events
+        self.lag_polls = lag_polls
+        self.pending = []
+        self.drawn = []
+
+    def click_input(self, coords):
+        self.events.append(("click", coords))
+
+    def press_mouse_input(self, coords):
+        self.events.append(("press", coords))
+
+    def move_mouse_input(self, coords):
+        self.events.append(("move", coords))
+
+    def release_mouse_input(self, coords):
+        self.events.append(("release", coords))
+        self.pending.append(coords)
+
+    def pixels(self, box):
+        if self.pending:
+            self.lag_polls -= 1
+            if self.lag_polls < 0:
+                self.drawn += self.pending
+                self.pending = []
+        return tuple(self.drawn)
+
+
+class FakeWindow:
+    def __init__(self, events):
+        self.events = events
+        self.canvas = FakeCanvas(events)
+        self.focused = False
+
+    def has_focus(self):
+        return self.focused
+
+    def set_focus(self):
+        self.events.append(("focus",))
+        self.focused = True
+
+    def click_input(self, coords):
+        self.events.append(("tool", coords))
+
+    def type_keys(self, keys, **kwargs):
+        self.events.append(("keys", keys))
+
+    def child_window(self, class_name):
+        assert class_name == "MSPaintView"
+        return self.canvas
+
+
+class FakeApp:
+    def __init__(self):
+        self.events = []
+        self.main = FakeWindow(self.events)
+
+    def window(self, class_name):
+        assert class_name == "MSPaintApp"
+        return self.main
+
+
+def fake_backend(clock, **probes):
+    backend = WindowsPaintBackend(clock=clock, **{
+        "idle_probe": lambda canvas: True,
+        "mouse_probe": lambda: True,
+        "snapshot": lambda canvas, box: canvas.pixels(box),
+        **probes,
+    })
+    backend.app = FakeApp()
+    return backend
+
+
+def test_wait_until_backs_off_on_the_injected_clock():
+    clock = FakeClock()
+    with pytest.raises(TimeoutError, match="thing"):
+        wait_until(lambda: False, timeout=1.0, description="thing", clock=clock)
+    assert clock.sleeps[:5] == [0.01, 0.02, 0.04, 0.08, 0.16]
+    assert max(clock.sleeps) == MAX_INTERVAL
+    assert clock.t == pytest.approx(1.0)
+
+
+def test_wait_until_returns_the_first_truthy_value():
+    answers = iter([None, 0, "ready"])
+    assert wait_until(lambda: next(answers), clock=FakeClock()) == "ready"
+
+
+def test_only_not_ready_errors_are_retried():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise LookupError("not there yet")
+        return True
+
+    assert wait_until(flaky, clock=FakeClock(), retry_on=(LookupError,))
+    clock = FakeClock()
+
+    def missing_module():
+        raise ImportError("No module named 'win32gui'")
+
+    with pytest.raises(ImportError):
+        wait_until(missing_module, clock=clock)
+    assert clock.t == 0.0
+
+
+def test_canvas_change_that_never_comes_is_not_an_error():
+    clock = FakeClock()
+    assert wait_for_canvas_change(lambda: b"same", b"same", clock=clock) is False
+    assert clock.t == pytest.approx(CHANGE_TIMEOUT)
+
+
+def test_draw_rectangle_against_a_fake_window():
+    clock = FakeClock()
+    backend = fake_backend(clock)
+    started = time.perf_counter()
+    backend.draw_rectangle(780, 380, 1140, 700)
+    assert time.perf_counter() - started < 0.5
+    assert backend.app.events == [
+        ("focus",),
+        ("tool", RECTANGLE_TOOL),
+        ("click", (780, 380)),
+        ("press", (780, 380)),
+        ("move", (1140, 700)),
+        ("release", (1140, 700)),
+    ]
+    assert backend.app.main.canvas.drawn == [(1140, 700)]
+    # Bounded by the (simulated) UI response, three polls of lag, not by sleep constants
+    assert clock.t < 0.1
+
+
+def test_batch_selects_each_tool_once_and_tolerates_no_op_fills():
+    clock = FakeClock()
+    backend = fake_backend(clock)
+    count = backend.run_batch([
+        DrawCommand("rect", (10, 10, 50, 50)),
+        DrawCommand("rect", (60, 60, 90, 90)),
+        DrawCommand("fill", (20, 20)),
+    ])
+    assert count == 3
+    tools = [event[1] for event in backend.app.events if event[0] == "tool"]
+    assert tools == [RECTANGLE_TOOL, FILL_TOOL]
+    # The fill changes nothing on the fake canvas: it costs CHANGE_TIMEOUT, not an exception
+    assert clock.t >= CHANGE_TIMEOUT
+
+
+def test_missing_windows_modules_fail_fast():
+    clock = FakeClock()
+    backend = fake_backend(clock, idle_probe=None)
+    with pytest.raises(ImportError):
+        backend.draw_rectangle(1, 1, 5, 5)
+    assert clock.t == 0.0
@@ -0,0 +1,54 @@
+import math
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from vector_math import SMALL_LIST_MAX, elementwise, exp_sum, log_sum_exp, reduce
+
+
+@pytest.mark.parametrize("values", [
+    [68, 104, 97, 110, 117, 115, 104],
+    list(range(SMALL_LIST_MAX)),
+    [700, 700, 701],
+    [-800, 0, 3.5],
+])
+def test_short_lists_agree_with_the_numpy_path(values):
+    assert exp_sum(values) == pytest.approx(exp_sum(np.array(values, dtype=float)), rel=1e-12)
+
+
+def test_long_lists_use_numpy_with_the_same_result():
+    values = list(range(SMALL_LIST_MAX + 1))
+    assert exp_sum(values) == pytest.approx(math.fsum(math.exp(v) for v in values), rel=1e-12)
+
+
+@pytest.mark.parametrize("values", [[1000.0] * 10, [1000.0] * (SMALL_LIST_MAX + 1)])
+def test_sums_beyond_float64_raise(values):
+    with pytest.raises(OverflowError, match="log_sum_exp"):
+        exp_sum(values)
+    assert log_sum_exp(values) == pytest.approx(1000 + math.log(len(values)))
+
+
+def test_empty_sum_is_zero():
+    assert exp_sum([]) == 0.0
+    assert reduce("expsum", []) == 0.0
+    with pytest.raises(ValueError, match="undefined"):
+        reduce("mean", [])
+
+
+def test_ops_and_reductions():
+    assert elementwise("add", [1, 2], [10]) == [11.0, 12.0]
+    assert reduce("norm", [3, 4]) == 5.0
+    with pytest.raises(ValueError, match="divide failed"):
+        elementwise("divide", [1.0], [0.0])
+    with pytest.raises(ValueError, match="Unknown op"):
+        elementwise("cube", [1.0])
+
+
+def test_short_exp_sum_does_not_import_numpy():
+    code = "import sys, vector_math; vector_math.exp_sum([1, 2, 3]); print('numpy' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=Path(__file__).parent.parent)
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,176 @@
+import glob
+import hashlib
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from atomic_file import TMP_SUFFIX, write_atomic
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+THUMB_DIR = os.path.join(HERE, ".thumb_cache")
+THUMB_VERSION = 1
+THUMB_SIZE = (100, 100)
+# Bounds on the disk cache; past either, the least recently used thumbnails are removed
+THUMB_CACHE_MAX_FILES = int(os.getenv("THUMB_CACHE_MAX_FILES", "20000"))
+THUMB_CACHE_MAX_BYTES = int(os.getenv("THUMB_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Cache writes between two sweeps of the cache directory, per process
+PRUNE_EVERY = 64
+# Most files one batch call may process
+MAX_BATCH_FILES = int(os.getenv("THUMB_MAX_BATCH_FILES", "10000"))
+
+# Encoder settings per output format
+FORMATS = {
+    "png": {"format": "PNG", "optimize": False},
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+}
+
+
+def thumbnail_key(path: str, size=THUMB_SIZE, fmt: str = "png") -> str:
+    """Cache key from the file's path, mtime and size plus the thumbnail settings"""
+    stat = os.stat(path)
+    raw = f"v{THUMB_VERSION}|{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}|{fmt}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def prune_cache(cache_dir: str = THUMB_DIR, max_files: int = None, max_bytes: int = None) -> int:
+    """
+    Remove the oldest thumbnails (by mtime, which cache hits refresh) until the cache is within
+    90% of both bounds, so the next sweeps have room before they delete again. Returns the number removed.
+    """
+    max_files = THUMB_CACHE_MAX_FILES if max_files is None else max_files
+    max_bytes = THUMB_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        with os.scandir(cache_dir) as it:
+            entries = []
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(TMP_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+    files = len(entries)
+    total = sum(size for _, size, _ in entries)
+    if files <= max_files and total <= max_bytes:
+        return 0
+    entries.sort()
+    removed = 0
+    for _, size, path in entries:
+        if files <= max_files * 0.9 and total <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Another process swept it first
+            pass
+        files -= 1
+        total -= size
+        removed += 1
+    return removed
+
+
+_writes = 0
+
+
+def render_thumbnail(path: str, size=THUMB_SIZE, fmt: str = "png") -> bytes:
+    """Decode, shrink and encode one image"""
+    with Image.open(path) as img:
+        # JPEG decodes straight to a reduced scale (1/2, 1/4 or 1/8) no smaller than size
+        img.draft("RGB", size)
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(size)
+        if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            img = img.convert("RGBA" if "A" in img.mode else "RGB")
+        out = io.BytesIO()
+        img.save(out, **FORMATS[fmt])
+        return out.getvalue()
+
+
+def make_thumbnail(path: str, size=THUMB_SIZE, fmt: str = "png", cache_dir: str = THUMB_DIR) -> tuple[bytes, bool]:
+    """
+    Return (encoded thumbnail, served_from_cache). Thumbnails are kept on disk, so a repeated
+    request for an unchanged file is a single read without decoding the original.
+    """
+    global _writes
+    fmt = fmt.lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported thumbnail format {fmt!r}, choose from {', '.join(FORMATS)}")
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"{thumbnail_key(path, size, fmt)}.{fmt}")
+        try:
+            with open(cache_path, "rb") as f:
+                data = f.read()
+            # Mark it recently used so the sweep keeps it
+            os.utime(cache_path)
+            return data, True
+        except FileNotFoundError:
+            pass
+
+    data = render_thumbnail(path, size, fmt)
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_atomic(cache_path, data)
+        if _writes % PRUNE_EVERY == 0:
+            prune_cache(cache_dir)
+        _writes += 1
+    return data, False
+
+
+def batch_inputs(paths: list[str] = None, pattern: str = None) -> list[str]:
+    """Files named by an explicit list and/or a glob pattern (** recurses), without duplicates"""
+    found = list(paths or [])
+    if pattern:
+        found += sorted(glob.glob(os.path.expanduser(pattern), recursive=True))
+    unique = list(dict.fromkeys(os.path.abspath(p) for p in found))
+    files = [p for p in unique if os.path.isfile(p)]
+    if not files:
+        raise ValueError("No input files matched")
+    if len(files) > MAX_BATCH_FILES:
+        raise ValueError(f"{len(files)} files matched, more than the limit of {MAX_BATCH_FILES}")
+    return files
+
+
+def output_names(files: list[str], fmt: str) -> list[str]:
+    """<stem>.<fmt> for every input, numbering repeated stems"""
+    seen = {}
+    names = []
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        count = seen.get(stem, 0)
+        seen[stem] = count + 1
+        names.append(f"{stem}.{fmt}" if count == 0 else f"{stem}-{count}.{fmt}")
+    return names
+
+
+def batch_worker(path: str, output_path: str, size, fmt: str, cache_dir: str = THUMB_DIR) -> dict:
+    """Thumbnail one file into output_path; runs in a pool process and never raises"""
+    started = time.perf_counter()
+    entry = {"path": path, "output": output_path}
+    try:
+        data, cached = make_thumbnail(path, tuple(size), fmt, cache_dir)
+        with open(output_path, "wb") as f:
+            f.write(data)
+        entry.update(ok=True, cache_hit=cached, bytes=len(data))
+    except Exception as e:
+        entry.update(ok=False, error=f"{type(e).__name__}: {e}")
+    entry["elapsed"] = round(time.perf_counter() - started, 6)
+    return entry
+
+
+_pool = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool shared by batch calls, one worker per core, started on first use"""
+    global _pool
+    if _pool is None:
+        # spawn: the server process runs an event loop and threads, which fork would copy mid-flight
+        _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
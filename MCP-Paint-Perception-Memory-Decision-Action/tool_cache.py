@@ -0,0 +1,118 @@
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+
+from mcp import types
+
+from atomic_file import write_atomic
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Files whose contents determine the tool names, descriptions and input schemas
+SERVER_FILES = ["example2-4.py", "models.py"]
+# Packages whose versions shape the generated schemas (FastMCP derives them through Pydantic)
+SCHEMA_PACKAGES = ["mcp", "pydantic"]
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(HERE, ".tool_cache")
+CACHE_VERSION = 1
+
+
+def server_fingerprint(files=SERVER_FILES, base_dir=HERE, packages=SCHEMA_PACKAGES) -> str:
+    """Hash the server source files and the schema-generating package versions; any change produces a new key"""
+    digest = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    for package in packages:
+        try:
+            version = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            version = "<missing>"
+        digest.update(f"{package}=={version}".encode())
+    for name in files:
+        digest.update(name.encode())
+        path = os.path.join(base_dir, name)
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+def render_tools_description(tools) -> str:
+    """Render the numbered tool listing that goes into the system prompt"""
+    tools_description = []
+    for i, tool in enumerate(tools):
+        try:
+            # Get tool properties
+            params = tool.inputSchema
+            desc = getattr(tool, 'description', 'No description available')
+            name = getattr(tool, 'name', f'tool_{i}')
+
+            # Format the input schema in a more readable way
+            if 'properties' in params:
+                param_details = []
+                for param_name, param_info in params['properties'].items():
+                    param_type = param_info.get('type', 'unknown')
+                    param_details.append(f"{param_name}: {param_type}")
+                params_str = ', '.join(param_details)
+            else:
+                params_str = 'no parameters'
+
+            tools_description.append(f"{i+1}. {name}({params_str}) - {desc}")
+        except Exception as e:
+            logger.warning("Error processing tool %d: %s", i, e)
+            tools_description.append(f"{i+1}. Error processing tool")
+    return "\n".join(tools_description)
+
+
+def prime_session(session, tools) -> None:
+    """
+    Give the session the output schemas of cached tools. ClientSession validates results
+    against them and otherwise sends its own tools/list before the first call_tool, which
+    would undo the saving of the cache.
+    """
+    schemas = getattr(session, "_tool_output_schemas", None)
+    if isinstance(schemas, dict):
+        for tool in tools:
+            schemas.setdefault(tool.name, tool.outputSchema)
+
+
+def _cache_path(fingerprint: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"tools-{fingerprint[:16]}.json")
+
+
+def load_tool_catalogue(fingerprint: str, cache_dir: str = CACHE_DIR):
+    """Return (tools, tools_description) for this fingerprint, or None on a miss"""
+    try:
+        with open(_cache_path(fingerprint, cache_dir), encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("fingerprint") != fingerprint:
+            return None
+        tools = [types.Tool.model_validate(t) for t in data["tools"]]
+        return tools, data["tools_description"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_tool_catalogue(fingerprint: str, tools, tools_description: str, cache_dir: str = CACHE_DIR) -> str:
+    """Write the catalogue atomically and drop entries for older fingerprints"""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(fingerprint, cache_dir)
+    data = {
+        "fingerprint": fingerprint,
+        "tools": [t.model_dump(mode="json", exclude_none=True) for t in tools],
+        "tools_description": tools_description,
+    }
+    write_atomic(path, json.dumps(data))
+
+    for name in os.listdir(cache_dir):
+        stale = os.path.join(cache_dir, name)
+        if name.startswith("tools-") and name.endswith(".json") and stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return path
@@ -0,0 +1,159 @@
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from pydantic import BaseModel
+
+# Bounds of the shared result cache: entry count and approximate result bytes
+RESULT_CACHE_ENTRIES = int(os.getenv("TOOL_RESULT_CACHE_ENTRIES", "1024"))
+RESULT_CACHE_BYTES = int(os.getenv("TOOL_RESULT_CACHE_BYTES", str(16 * 1024 * 1024)))
+# Calls with more list items than this bypass the cache: building their key costs more than recomputing
+RESULT_CACHE_MAX_ITEMS = int(os.getenv("TOOL_RESULT_CACHE_MAX_ITEMS", "10000"))
+
+
+def canonical_arguments(bound: inspect.BoundArguments) -> str:
+    """Stable key for validated arguments: models as their JSON dump, keys sorted"""
+
+    def canonical(value):
+        if isinstance(value, BaseModel):
+            return {"__model__": type(value).__name__, **value.model_dump(mode="json")}
+        return value
+
+    return json.dumps({name: canonical(value) for name, value in bound.arguments.items()},
+                      sort_keys=True, separators=(",", ":"), default=repr)
+
+
+def argument_items(value) -> int:
+    """Number of scalar-ish items in an argument, counting list elements"""
+    if isinstance(value, BaseModel):
+        return sum(argument_items(v) for v in value.__dict__.values())
+    if isinstance(value, (list, tuple, dict)):
+        return len(value)
+    return 1
+
+
+def result_size(value) -> int:
+    """Approximate memory held by a cached result"""
+    if isinstance(value, int):
+        return sys.getsizeof(value)
+    if isinstance(value, BaseModel):
+        return len(value.model_dump_json())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_size(k) + result_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    LRU cache of tool results bounded by entry count and total result bytes.
+    Results larger than a quarter of the byte budget are returned but not stored.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_ENTRIES, max_bytes: int = RESULT_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.tool_stats = {}
+
+    def _stats(self, tool: str) -> dict:
+        return self.tool_stats.setdefault(tool, {"hits": 0, "misses": 0, "evictions": 0, "uncacheable": 0,
+                                                 "bypassed": 0})
+
+    def bypass(self, tool: str) -> None:
+        with self._lock:
+            self._stats(tool)["bypassed"] += 1
+
+    def get(self, tool: str, key: str):
+        """Return (True, result) on a hit and (False, None) on a miss"""
+        with self._lock:
+            entry = self._entries.get((tool, key))
+            if entry is None:
+                self._stats(tool)["misses"] += 1
+                return False, None
+            self._entries.move_to_end((tool, key))
+            self._stats(tool)["hits"] += 1
+            return True, entry[0]
+
+    def put(self, tool: str, key: str, result) -> None:
+        size = result_size(result)
+        with self._lock:
+            if size > self.max_bytes // 4:
+                self._stats(tool)["uncacheable"] += 1
+                return
+            old = self._entries.pop((tool, key), None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[(tool, key)] = (result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                (evicted_tool, _), (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats(evicted_tool)["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self) -> dict:
+        with self._lock:
+            hits = sum(s["hits"] for s in self.tool_stats.values())
+            misses = sum(s["misses"] for s in self.tool_stats.values())
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "tools": {tool: dict(stats) for tool, stats in self.tool_stats.items()},
+            }
+
+
+RESULT_CACHE = ResultCache()
+
+
+def pure(fn=None, *, cache: ResultCache = None):
+    """
+    Declare a tool pure: its result depends only on its arguments and it has no side effects,
+    so repeated calls are answered from the result cache. Apply it below @mcp.tool():
+
+        @mcp.tool()
+        @pure
+        def power(a: int, b: int) -> int: ...
+
+    The signature is preserved, so the tool schema and argument validation are unchanged.
+    """
+    if fn is None:
+        return lambda f: pure(f, cache=cache)
+
+    signature = inspect.signature(fn)
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        store = cache or RESULT_CACHE
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if sum(argument_items(v) for v in bound.arguments.values()) > RESULT_CACHE_MAX_ITEMS:
+            store.bypass(name)
+            return fn(*args, **kwargs)
+        key = canonical_arguments(bound)
+        hit, result = store.get(name, key)
+        if hit:
+            return result
+        result = fn(*args, **kwargs)
+        store.put(name, key, result)
+        return result
+
+    wrapper.pure = True
+    return wrapper
@@ -0,0 +1,154 @@
+import atexit
+import bisect
+import threading
+import time
+
+from atomic_file import write_atomic
+
+# Histogram upper bounds in seconds: 10us to ~100s, two buckets per doubling
+BUCKETS = tuple(1e-5 * 2 ** (i / 2) for i in range(47))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; quantiles are interpolated inside the bucket they fall in"""
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        # One extra bucket for everything above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class ToolMetrics:
+    """
+    Call counts, error counts and latency histograms per tool. Tools run on the
+    server's event loop thread, so updates need no lock.
+    """
+
+    def __init__(self):
+        self.tools = {}
+        self.unknown_calls = 0
+        self.started = time.time()
+
+    def observe(self, name: str, seconds: float, error: bool = False) -> None:
+        stats = self.tools.get(name)
+        if stats is None:
+            stats = self.tools[name] = {"calls": 0, "errors": 0, "latency": LatencyHistogram()}
+        stats["calls"] += 1
+        if error:
+            stats["errors"] += 1
+        stats["latency"].observe(seconds)
+
+    def snapshot(self) -> dict:
+        tools = {}
+        for name, stats in sorted(self.tools.items()):
+            latency = stats["latency"]
+            tools[name] = {
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "mean_ms": round(1000 * latency.sum / latency.count, 3) if latency.count else 0.0,
+                "p50_ms": round(1000 * latency.quantile(0.50), 3),
+                "p95_ms": round(1000 * latency.quantile(0.95), 3),
+                "p99_ms": round(1000 * latency.quantile(0.99), 3),
+                "max_ms": round(1000 * latency.max, 3),
+            }
+        return {"uptime_s": round(time.time() - self.started, 3), "unknown_tool_calls": self.unknown_calls,
+                "tools": tools}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = [
+            "# HELP mcp_tool_calls_total Tool calls by tool.",
+            "# TYPE mcp_tool_calls_total counter",
+        ]
+        for name, stats in sorted(self.tools.items()):
+            lines.append(f'mcp_tool_calls_total{{tool="{name}"}} {stats["calls"]}')
+        lines += ["# HELP mcp_tool_errors_total Tool calls that raised, by tool.",
+                  "# TYPE mcp_tool_errors_total counter"]
+        for name, stats in sorted(self.tools.items()):
+            lines.append(f'mcp_tool_errors_total{{tool="{name}"}} {stats["errors"]}')
+        lines += ["# HELP mcp_tool_unknown_calls_total Calls naming a tool the server does not have.",
+                  "# TYPE mcp_tool_unknown_calls_total counter",
+                  f"mcp_tool_unknown_calls_total {self.unknown_calls}",
+                  "# HELP mcp_tool_latency_seconds Tool call latency, including argument validation.",
+                  "# TYPE mcp_tool_latency_seconds histogram"]
+        for name, stats in sorted(self.tools.items()):
+            latency = stats["latency"]
+            cumulative = 0
+            for bound, n in zip(latency.bounds, latency.counts):
+                cumulative += n
+                lines.append(f'mcp_tool_latency_seconds_bucket{{tool="{name}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'mcp_tool_latency_seconds_bucket{{tool="{name}",le="+Inf"}} {latency.count}')
+            lines.append(f'mcp_tool_latency_seconds_sum{{tool="{name}"}} {latency.sum:.9f}')
+            lines.append(f'mcp_tool_latency_seconds_count{{tool="{name}"}} {latency.count}')
+        return "\n".join(lines) + "\n"
+
+
+def instrument_tools(mcp, metrics: ToolMetrics = None) -> ToolMetrics:
+    """
+    Time every tool call of a FastMCP server, covering argument validation, the tool
+    itself and result conversion. Hooks the tool manager once instead of each tool.
+    """
+    metrics = metrics or ToolMetrics()
+    manager = mcp._tool_manager
+    call_tool = manager.call_tool
+    perf_counter = time.perf_counter
+
+    async def timed_call_tool(name, arguments, context=None, convert_result=False):
+        if manager.get_tool(name) is None:
+            # Not a label: a model inventing tool names must not grow the metric set
+            metrics.unknown_calls += 1
+            return await call_tool(name, arguments, context=context, convert_result=convert_result)
+        started = perf_counter()
+        try:
+            result = await call_tool(name, arguments, context=context, convert_result=convert_result)
+        except BaseException:
+            metrics.observe(name, perf_counter() - started, error=True)
+            raise
+        metrics.observe(name, perf_counter() - started)
+        return result
+
+    manager.call_tool = timed_call_tool
+    return metrics
+
+
+def start_prometheus_dump(metrics: ToolMetrics, path: str, interval: float = 15.0) -> threading.Thread:
+    """Rewrite path with the Prometheus text every interval seconds and at exit (textfile-collector style)"""
+
+    def write():
+        write_atomic(path, metrics.prometheus())
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write()
+            except OSError:
+                pass
+
+    atexit.register(write)
+    thread = threading.Thread(target=loop, name="prometheus-dump", daemon=True)
+    thread.start()
+    return thread
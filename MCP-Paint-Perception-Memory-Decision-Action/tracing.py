@@ -0,0 +1,213 @@
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Span of the code currently running; asyncio tasks inherit it from the task that created them
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation of a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "service", "attributes", "start", "duration", "status")
+
+    def __init__(self, trace_id: str, parent_id: str, name: str, service: str, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.service = service
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = 0.0
+        self.status = "ok"
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def traceparent(self) -> str:
+        """W3C trace context header value naming this span as the parent"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start": round(self.start, 6),
+            "duration_ms": round(1000 * self.duration, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes) -> None:
+        pass
+
+    def traceparent(self):
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def parse_traceparent(value: str):
+    """(trace_id, parent span_id) from a traceparent value, or None if it is malformed"""
+    parts = value.split("-") if isinstance(value, str) else []
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+class FileExporter:
+    """Appends finished spans to a JSONL file; client and server processes may share one file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporter; without an exporter spans cost nothing"""
+
+    def __init__(self, exporter: FileExporter = None, service: str = "client"):
+        self.exporter = exporter
+        self.service = service
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str, traceparent: str = None, **attributes):
+        """
+        Time the enclosed block as a child of the current span, or of the remote span named by
+        traceparent, or as the root of a new trace.
+        """
+        if self.exporter is None:
+            yield NOOP_SPAN
+            return
+        remote = parse_traceparent(traceparent) if traceparent else None
+        parent = _current.get()
+        if remote:
+            trace_id, parent_id = remote
+        elif parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+        span = Span(trace_id, parent_id, name, self.service,
+                    {k: v for k, v in attributes.items() if v is not None})
+        token = _current.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current.reset(token)
+            self.exporter.export(span)
+
+
+_tracer = Tracer()
+
+
+def configure(path: str = None, service: str = "client") -> Tracer:
+    """Send spans to path (JSONL); path=None turns tracing off"""
+    global _tracer
+    _tracer = Tracer(FileExporter(path) if path else None, service)
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def trace_meta(span) -> dict:
+    """MCP request _meta carrying the span as the remote parent, or None when tracing is off"""
+    traceparent = span.traceparent()
+    return {"traceparent": traceparent} if traceparent else None
+
+
+def instrument_tracing(mcp) -> None:
+    """
+    Wrap every tool call of a FastMCP server in a "tool" span, continuing the client's trace
+    when the request _meta carries a traceparent.
+    """
+    manager = mcp._tool_manager
+    call_tool = manager.call_tool
+
+    async def traced_call_tool(name, arguments, context=None, convert_result=False):
+        tracer = get_tracer()
+        if not tracer.enabled:
+            return await call_tool(name, arguments, context=context, convert_result=convert_result)
+        traceparent = None
+        try:
+            meta = context.request_context.meta if context is not None else None
+            traceparent = getattr(meta, "traceparent", None)
+        except (LookupError, ValueError):
+            pass
+        with tracer.span("tool", traceparent=traceparent, tool=name):
+            return await call_tool(name, arguments, context=context, convert_result=convert_result)
+
+    manager.call_tool = traced_call_tool
+
+
+def load_spans(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def format_trace_tree(spans: list[dict]) -> str:
+    """Every trace as an indented tree of spans with start offsets and durations"""
+    by_trace = {}
+    for span in spans:
+        by_trace.setdefault(span["trace_id"], []).append(span)
+    lines = []
+    for trace_id, trace in by_trace.items():
+        ids = {s["span_id"] for s in trace}
+        children = {}
+        for span in trace:
+            parent = span["parent_id"] if span["parent_id"] in ids else None
+            children.setdefault(parent, []).append(span)
+        origin = min(s["start"] for s in trace)
+        lines.append(f"trace {trace_id}")
+
+        def walk(parent, depth):
+            for span in sorted(children.get(parent, []), key=lambda s: s["start"]):
+                attrs = " ".join(f"{k}={v}" for k, v in span["attributes"].items() if k != "error")
+                status = "" if span["status"] == "ok" else f"  [{span['attributes'].get('error', 'error')}]"
+                lines.append(f"  {1000 * (span['start'] - origin):9.1f} ms {span['duration_ms']:9.1f} ms  "
+                             f"{'  ' * depth}{span['service']}:{span['name']} {attrs}{status}")
+                walk(span["span_id"], depth + 1)
+
+        walk(None, 0)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or not os.path.exists(sys.argv[1]):
+        print("usage: python tracing.py TRACE_FILE.jsonl", file=sys.stderr)
+        sys.exit(2)
+    print(format_trace_tree(load_spans(sys.argv[1])))
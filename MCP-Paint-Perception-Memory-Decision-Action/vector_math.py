@@ -0,0 +1,113 @@
+import math
+import sys
+
+# NumPy is imported inside the functions that need it: importing it costs ~80 ms, more
+# than a short exp_sum takes with math.fsum, and the MCP server imports this module on
+# its first exp-sum call
+
+# exp(x) overflows float64 above this
+EXP_MAX = math.log(sys.float_info.max)
+# Python lists up to this length are summed with math.fsum instead of NumPy
+SMALL_LIST_MAX = 64
+
+# NumPy ufunc names
+UNARY_OPS = ("exp", "log", "sqrt", "abs", "negative", "square")
+BINARY_OPS = ("add", "subtract", "multiply", "divide", "power", "maximum", "minimum")
+
+
+def as_array(values):
+    import numpy as np
+
+    if isinstance(values, np.ndarray):
+        return values.astype(np.float64, copy=False)
+    # fromiter with a known count is the cheapest way from a Python list to a float64 array
+    return np.fromiter(values, dtype=np.float64, count=len(values))
+
+
+def log_sum_exp(values) -> float:
+    """log(sum(exp(values))) without overflow, by factoring out the largest value"""
+    import numpy as np
+
+    a = as_array(values)
+    if a.size == 0:
+        raise ValueError("log_sum_exp of an empty list is -inf")
+    m = a.max()
+    return float(m + np.log(np.exp(a - m).sum()))
+
+
+def exp_sum(values) -> float:
+    """
+    sum(exp(values)). Summed directly when no overflow is possible, otherwise through
+    log_sum_exp, so only a sum that is itself beyond float64 raises. Short Python lists
+    take the same route with math.fsum, without importing NumPy.
+    """
+    if not hasattr(values, "dtype") and len(values) <= SMALL_LIST_MAX:
+        if not values:
+            return 0.0
+        m = max(values)
+        if m + math.log(len(values)) < EXP_MAX:
+            return math.fsum(math.exp(v) for v in values)
+        lse = m + math.log(math.fsum(math.exp(v - m) for v in values))
+    else:
+        import numpy as np
+
+        a = as_array(values)
+        if a.size == 0:
+            return 0.0
+        m = a.max()
+        if m + math.log(a.size) < EXP_MAX:
+            return float(np.exp(a).sum())
+        lse = log_sum_exp(a)
+    if lse >= EXP_MAX:
+        raise OverflowError(f"sum of exponentials is e^{lse:.6g}, beyond float64; use log_sum_exp instead")
+    return math.exp(lse)
+
+
+def _checked(op: str, fn):
+    import numpy as np
+
+    # Overflow, division by zero and invalid results (inf/nan) become errors instead of values JSON cannot carry
+    try:
+        with np.errstate(over="raise", divide="raise", invalid="raise", under="ignore"):
+            return fn()
+    except FloatingPointError as e:
+        raise ValueError(f"{op} failed for these inputs: {e}")
+
+
+def elementwise(op: str, a, b=None) -> list[float]:
+    """Apply a unary op to a, or a binary op to a and b (b may also be a single value)"""
+    import numpy as np
+
+    x = as_array(a)
+    if op in UNARY_OPS:
+        if b is not None:
+            raise ValueError(f"{op} takes one list")
+        return _checked(op, lambda: getattr(np, op)(x)).tolist()
+    if op in BINARY_OPS:
+        if b is None:
+            raise ValueError(f"{op} needs a second list b")
+        y = as_array(b)
+        if y.size != 1 and y.shape != x.shape:
+            raise ValueError(f"b must have one value or as many as a ({x.size}), got {y.size}")
+        return _checked(op, lambda: getattr(np, op)(x, y)).tolist()
+    raise ValueError(f"Unknown op {op!r}, choose from {', '.join([*UNARY_OPS, *BINARY_OPS])}")
+
+
+# Names of NumPy reductions, plus the two exp-sum reductions of this module
+REDUCTIONS = ("sum", "mean", "min", "max", "prod", "std", "norm", "logsumexp", "expsum")
+
+
+def _reduction(op: str):
+    import numpy as np
+
+    return {"norm": np.linalg.norm, "logsumexp": log_sum_exp, "expsum": exp_sum}.get(op) or getattr(np, op)
+
+
+def reduce(op: str, values) -> float:
+    """Reduce a list to one number"""
+    if op not in REDUCTIONS:
+        raise ValueError(f"Unknown reduction {op!r}, choose from {', '.join(REDUCTIONS)}")
+    x = as_array(values)
+    if x.size == 0 and op not in ("sum", "prod", "expsum"):
+        raise ValueError(f"{op} of an empty list is undefined")
+    return float(_checked(op, lambda: _reduction(op)(x)))